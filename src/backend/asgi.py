@@ -0,0 +1,36 @@
+from quart import Quart, Response, request
+from backend import metrics
+from backend.async_session import async_engine
+from backend.routes.v1_async import v1
+
+app = Quart(__name__)
+app.register_blueprint(v1, url_prefix="/v1")
+metrics.instrument_engine(async_engine.sync_engine)
+
+
+@app.before_request
+async def start_request_metrics():
+    metrics.start_request(metrics.route_label(request))
+
+
+@app.after_request
+async def finish_request_metrics(response):
+    metrics.finish_request(request.method, response.status_code)
+    return response
+
+
+@app.route("/metrics")
+async def prometheus_metrics():
+    return Response(
+        metrics.render_metrics(async_engine.sync_engine),
+        mimetype=metrics.PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+@app.after_serving
+async def dispose_engine():
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5234)
@@ -0,0 +1,58 @@
+# --- Async Database Sessions ---
+import time
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from backend.config import DATABASE_URL, POOL_SIZE, pool_options
+from backend.session import record_checkout
+
+
+def async_database_url(url):
+    """
+    Rewrites a Postgres connection string for the asyncpg driver.
+
+    asyncpg takes `ssl` where libpq takes `sslmode`, so that option is
+    carried over under its new name.
+    """
+    url = make_url(url).set(drivername="postgresql+asyncpg")
+    sslmode = url.query.get("sslmode")
+    if sslmode:
+        url = url.difference_update_query(["sslmode"]).update_query_dict(
+            {"ssl": sslmode}
+        )
+    return url
+
+
+def _connect_args():
+    if POOL_SIZE <= 0:
+        # PgBouncer in transaction mode cannot keep prepared statements
+        return {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    return {}
+
+
+async_engine = create_async_engine(
+    async_database_url(DATABASE_URL), connect_args=_connect_args(), **pool_options()
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def run_query(query, *args, **kwargs):
+    """
+    Runs one of the query helpers of backend.routes.v1 on its own session.
+
+    The helpers are written against a synchronous Session; run_sync hands
+    them one backed by an asyncpg connection. Every call checks out its own
+    connection, so independent queries of one request can be awaited
+    together with asyncio.gather.
+    """
+    async with AsyncSessionLocal() as session:
+        started = time.perf_counter()
+        try:
+            await session.connection()
+        except PoolTimeoutError:
+            record_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+        record_checkout(time.perf_counter() - started)
+        return await session.run_sync(query, *args, **kwargs)
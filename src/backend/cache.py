@@ -0,0 +1,251 @@
+# --- Response Cache ---
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, make_response, request
+from sqlalchemy import text
+from backend.config import engine
+from backend.migrations import MIGRATIONS
+
+CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "memory")  # memory, disk, off
+CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+CACHE_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+CACHE_DIR = os.environ.get(
+    "RESPONSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "insta_dm_cache")
+)
+# How long a worker trusts its last read of the data generation
+GENERATION_CHECK_SECONDS = float(os.environ.get("DATA_GENERATION_CHECK_SECONDS", "30"))
+# Bump when a deploy changes what a route returns for the same data, so
+# cached bodies and client ETags from the previous release stop matching
+RESPONSE_VERSION = 1
+# Part of every cache key and ETag, along with the schema version
+RESPONSE_VERSION_KEY = (
+    f"v{RESPONSE_VERSION}.{max(version for version, _, _ in MIGRATIONS)}"
+)
+
+
+class MemoryBackend:
+    """In-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskBackend:
+    """
+    Local-disk cache shared by all workers on a host.
+
+    One pickle file per entry; reads bump the file's mtime so eviction can
+    drop the least recently used files once `max_entries` is exceeded.
+    """
+
+    def __init__(self, directory, max_entries, ttl):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                expires_at, value = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires_at < time.time():
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Another worker evicted it after the read; the value is still good
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        # Write then rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as file:
+            pickle.dump((time.time() + self.ttl, value), file)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, name))
+
+    def _evict(self):
+        names = os.listdir(self.directory)
+        if len(names) <= self.max_entries:
+            return
+        paths = [os.path.join(self.directory, name) for name in names]
+        paths.sort(
+            key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0
+        )
+        for path in paths[: len(paths) - self.max_entries]:
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _make_backend():
+    if CACHE_BACKEND == "disk":
+        return DiskBackend(CACHE_DIR, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+    if CACHE_BACKEND == "memory":
+        return MemoryBackend(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+    return None
+
+
+backend = _make_backend()
+
+_generation = {"value": 0, "checked_at": None}
+_generation_lock = threading.Lock()
+GENERATION_QUERY = text("SELECT generation FROM data_generation WHERE id = 1")
+
+
+def fresh_generation():
+    """
+    Returns the last read data generation while it can still be trusted,
+    or None once GENERATION_CHECK_SECONDS have passed.
+    """
+    checked_at = _generation["checked_at"]
+    if checked_at is None or time.monotonic() - checked_at >= GENERATION_CHECK_SECONDS:
+        return None
+    return _generation["value"]
+
+
+def record_generation(value):
+    """Stores a freshly read data generation; None keeps the last known one."""
+    with _generation_lock:
+        if value is not None:
+            _generation["value"] = value
+        _generation["checked_at"] = time.monotonic()
+        return _generation["value"]
+
+
+def current_generation():
+    """
+    Returns the data generation that ingestion bumps after every load.
+
+    The value is re-read from the database at most once per
+    GENERATION_CHECK_SECONDS, so cache hits normally skip the database.
+    """
+    with _generation_lock:
+        generation = fresh_generation()
+        if generation is not None:
+            return generation
+        try:
+            with engine.connect() as connection:
+                value = connection.execute(GENERATION_QUERY).scalar() or 0
+        except Exception:
+            # Keep serving with the last known generation if the lookup fails
+            value = None
+    return record_generation(value)
+
+
+def cache_key(generation, path=None, args=None):
+    """
+    Builds the cache key from the response version, generation, route and
+    sorted query args.
+
+    `path` and `args` default to those of the current Flask request.
+    """
+    if path is None:
+        path, args = request.path, request.args
+    args = "&".join(
+        f"{name}={value}"
+        for name, values in sorted(args.lists())
+        for value in sorted(values)
+    )
+    return f"{RESPONSE_VERSION_KEY}:{generation}:{path}?{args}"
+
+
+def response_etag(key):
+    """The ETag of a response, a digest of its cache key."""
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def tag_response(response, etag):
+    """
+    Sets `etag` on a Flask or Quart response.
+
+    `no-cache` lets clients keep the body but makes them revalidate it on
+    every request, which a 304 answers without re-sending it.
+    """
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def cached_route(view):
+    """
+    Caches successful responses of an analytics route.
+
+    Entries are keyed on the data generation, so a re-ingest invalidates
+    everything at once; older entries simply age out of the LRU.
+
+    Responses carry an ETag derived from the same key, so a client sending
+    it back in If-None-Match gets a 304 without the view running, even when
+    the cache backend is off.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = cache_key(current_generation())
+        etag = response_etag(key)
+        if request.if_none_match.contains_weak(etag):
+            return tag_response(Response(status=304), etag)
+
+        cached = backend.get(key) if backend is not None else None
+        if cached is not None:
+            body, status, mimetype = cached
+            return tag_response(Response(body, status=status, mimetype=mimetype), etag)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            if backend is not None:
+                backend.set(key, (response.get_data(), 200, response.mimetype))
+            tag_response(response, etag)
+        return response
+
+    return wrapper
@@ -0,0 +1,412 @@
+# --- Columnar Analytics ---
+# Per-conversation metrics computed with NumPy over columns held in memory.
+# A conversation is read from the database once, then every metric of the v1
+# routes is answered from array slices until the data generation changes.
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import numpy as np
+from sqlalchemy import BigInteger, String, case, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from backend import cache
+from backend.config import MESSAGE_TIMEZONE
+from backend.models import Conversation, Message
+from backend.periods import period_labels
+
+# Memory budget for loaded conversations, per worker. 0 turns the engine off
+# and every metric is queried from the database as before.
+ANALYTICS_MEMORY_MB = float(os.environ.get("ANALYTICS_MEMORY_MB", "64"))
+
+# Senders are dictionary-encoded per conversation; these codes are fixed
+SELF, UNKNOWN, NO_SENDER = 0, 1, 255
+SENDER_CODE_COUNT = NO_SENDER + 1
+
+EPOCH = datetime(1970, 1, 1)
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def epoch_seconds(value):
+    """Parses a date parameter such as "2025-05-01" to naive epoch seconds."""
+    try:
+        return int(np.datetime64(value.strip().replace(" ", "T"), "s").astype(np.int64))
+    except (AttributeError, ValueError) as e:
+        raise ValueError(f"Invalid date {value}.") from e
+
+
+def sorted_unique(values):
+    """
+    np.unique(values, return_inverse=True) for already sorted values.
+
+    Finds the runs of equal values in one linear pass instead of sorting.
+    """
+    if not len(values):
+        return values, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    lengths = np.diff(np.append(starts, len(values)))
+    return values[starts], np.repeat(np.arange(len(starts)), lengths)
+
+
+@lru_cache(maxsize=65536)
+def _shift_at(seconds, source_name, target_name):
+    """Seconds from a naive `source_name` wall time to the same instant in `target_name`."""
+    wall = EPOCH + timedelta(seconds=seconds)
+    # fold=1 reads a repeated (fall-back) hour as standard time, like Postgres
+    local = wall.replace(tzinfo=ZoneInfo(source_name), fold=1).astimezone(
+        ZoneInfo(target_name)
+    )
+    return int((local.replace(tzinfo=None) - wall).total_seconds())
+
+
+def timezone_shifts(seconds, source_name, target_name):
+    """
+    Per-value seconds that convert naive `source_name` wall times to `target_name`.
+
+    `seconds` must be sorted. Offsets are looked up once per distinct day,
+    and per distinct hour only on days where one of the zones changes its
+    offset; lookups are memoized across requests.
+    """
+    if source_name == target_name or not len(seconds):
+        return np.zeros(len(seconds), dtype=np.int64)
+    days, day_index = sorted_unique(seconds // DAY)
+    day_start, day_end = (
+        np.array(
+            [_shift_at(int(day) * DAY + hour, source_name, target_name) for day in days]
+        )
+        for hour in (0, 23 * HOUR)
+    )
+    shifts = day_start[day_index]
+    for day in np.flatnonzero(day_start != day_end):
+        on_day = np.flatnonzero(day_index == day)
+        hours, hour_index = sorted_unique(seconds[on_day] // HOUR)
+        hour_shifts = np.array(
+            [_shift_at(int(hour) * HOUR, source_name, target_name) for hour in hours]
+        )
+        shifts[on_day] = hour_shifts[hour_index]
+    return shifts
+
+
+class ConversationColumns:
+    """
+    One conversation's messages as parallel NumPy columns.
+
+    Messages without a timestamp are left out. The rest are sorted by
+    (timestamp, id), the order the SQL queries use, and stored as:
+
+    - seconds: int64 naive epoch seconds in MESSAGE_TIMEZONE
+    - senders: uint8 index into `sender_names`, or NO_SENDER
+
+    Nine bytes per message.
+    """
+
+    def __init__(
+        self,
+        conversation_id,
+        username,
+        generation,
+        sender_names,
+        seconds,
+        senders,
+    ):
+        self.conversation_id = conversation_id
+        self.username = username
+        self.generation = generation
+        self.sender_names = sender_names
+        self.seconds = seconds
+        self.senders = senders
+
+    @property
+    def nbytes(self):
+        return self.seconds.nbytes + self.senders.nbytes
+
+    def _range(self, start_date_str, end_date_str):
+        """Slice of the messages with start <= timestamp <= end."""
+        low = np.searchsorted(self.seconds, epoch_seconds(start_date_str), "left")
+        high = np.searchsorted(self.seconds, epoch_seconds(end_date_str), "right")
+        return slice(low, high)
+
+    def _hour_range(self, start_date_str=None, end_date_str=None):
+        """
+        Slice of the messages whose hour lies within [start, end].
+
+        Matches filtering message_counts_hourly.hour, so rollup-based metrics
+        give the same answers as their SQL versions.
+        """
+        low = high = None
+        if start_date_str:
+            start = -(-epoch_seconds(start_date_str) // HOUR) * HOUR
+            low = np.searchsorted(self.seconds, start, "left")
+        if end_date_str:
+            end = epoch_seconds(end_date_str) // HOUR * HOUR + HOUR
+            high = np.searchsorted(self.seconds, end, "left")
+        return slice(low, high)
+
+    def _sender_totals(self, span):
+        counts = np.bincount(self.senders[span], minlength=SENDER_CODE_COUNT)
+        return int(counts[SELF]), int(counts[UNKNOWN])
+
+    def _monthly_volume(self, span):
+        """Months like "May 25" and message counts, of messages with a sender."""
+        seconds = self.seconds[span][self.senders[span] != NO_SENDER]
+        months, month_index = sorted_unique(
+            seconds.astype("datetime64[s]").astype("datetime64[M]")
+        )
+        counts = np.bincount(month_index, minlength=len(months))
+        labels = [month.astype(datetime).strftime("%b %y") for month in months]
+        return labels, [int(count) for count in counts]
+
+    def monthly_volume(self):
+        """Same result as routes.v1.query_monthly_volume for this conversation."""
+        return self._monthly_volume(slice(None))
+
+    def sender_counts(self, start_date_str=None, end_date_str=None):
+        """Same result as routes.v1.query_sender_counts."""
+        return self._sender_totals(self._hour_range(start_date_str, end_date_str))
+
+    def volume_by_period(self, start_date_str, end_date_str, timezone, boundaries):
+        """Same result as routes.v1.query_volume_by_period."""
+        span = self._range(start_date_str, end_date_str)
+        seconds = self.seconds[span]
+        local = seconds + timezone_shifts(seconds, MESSAGE_TIMEZONE, timezone)
+        hours = local // HOUR % 24
+        # Hours before the first boundary wrap into the last bucket
+        buckets = np.searchsorted(np.array(boundaries), hours, "right") - 1
+        buckets[buckets < 0] = len(boundaries) - 1
+        counts = np.bincount(
+            buckets * SENDER_CODE_COUNT + self.senders[span],
+            minlength=len(boundaries) * SENDER_CODE_COUNT,
+        ).reshape(len(boundaries), SENDER_CODE_COUNT)
+
+        return {
+            label: {
+                "self": int(row[SELF]),
+                "unknown": int(row[UNKNOWN]),
+                "total": int(row.sum()),
+            }
+            for label, row in zip(period_labels(boundaries), counts)
+        }
+
+    def response_times(self, start_date_str, end_date_str, percentiles, max_seconds):
+        """Same result as routes.v1.query_response_times."""
+        span = self._range(start_date_str, end_date_str)
+        has_sender = self.senders[span] != NO_SENDER
+        seconds = self.seconds[span][has_sender]
+        senders = self.senders[span][has_sender]
+
+        # Each message paired with its predecessor, as LAG does
+        gaps = np.diff(seconds)
+        replies = (senders[1:] != senders[:-1]) & (gaps <= max_seconds)
+        delays = gaps[replies]
+        repliers = senders[1:][replies]
+
+        def rounded(value):
+            return round(float(value), 2)
+
+        response_times = {}
+        # "self" and "unknown" always appear, other senders once they reply
+        for code in sorted({SELF, UNKNOWN} | set(np.unique(repliers).tolist())):
+            name = self.sender_names[code]
+            sender_delays = delays[repliers == code]
+            present = len(sender_delays) > 0
+            response_times[f"avg_{name}"] = (
+                rounded(sender_delays.mean()) if present else None
+            )
+            response_times[f"median_{name}"] = (
+                rounded(np.percentile(sender_delays, 50)) if present else None
+            )
+            for percentile in percentiles:
+                # Linear interpolation, as percentile_cont
+                response_times[f"p{percentile}_{name}"] = (
+                    rounded(np.percentile(sender_delays, percentile))
+                    if present
+                    else None
+                )
+        return response_times
+
+    def summary_metrics(self, start_date_str, end_date_str, metrics):
+        """Same result as routes.v1.summarize_hourly_counts."""
+        span = self._hour_range(start_date_str, end_date_str)
+        results = {}
+        if "message_comparison" in metrics:
+            self_count, unknown_count = self._sender_totals(span)
+            results["message_comparison"] = {
+                "self": self_count,
+                "unknown": unknown_count,
+            }
+        if "message_volume" in metrics:
+            months, counts = self._monthly_volume(span)
+            results["message_volume"] = {"months": months, "message_counts": counts}
+        return results
+
+
+def _parse_integers(text, dtype):
+    """Parses the comma-separated output of string_agg into an array."""
+    if not text:
+        return np.zeros(0, dtype=dtype)
+    return np.fromstring(text, dtype=np.int64, sep=",").astype(dtype, copy=False)
+
+
+def load_conversation(db, conversation_id, generation):
+    """
+    Reads one conversation into ConversationColumns.
+
+    The database encodes every column as integers and aggregates each one
+    into a single comma-separated string, in (timestamp, id) order, which
+    NumPy parses in one pass. Transferring two strings is much faster than
+    fetching a row object per message.
+
+    Returns:
+        ConversationColumns: Or None if the conversation does not exist or
+        has more distinct senders than a uint8 code can hold.
+    """
+    username = db.execute(
+        select(Conversation.username).where(Conversation.id == conversation_id)
+    ).scalar()
+    if username is None:
+        return None
+
+    in_conversation = (
+        Message.conversation_id == conversation_id,
+        Message.timestamp_iso_dt.isnot(None),
+    )
+    other_senders = sorted(
+        set(
+            db.execute(
+                select(Message.sender).where(*in_conversation).distinct()
+            ).scalars()
+        )
+        - {"self", "unknown", None}
+    )
+    sender_names = ["self", "unknown", *other_senders]
+    if len(sender_names) > NO_SENDER:
+        return None
+
+    sender_code = case(
+        *[(Message.sender == name, code) for code, name in enumerate(sender_names)],
+        else_=NO_SENDER,
+    )
+    epoch = cast(
+        func.floor(func.extract("epoch", Message.timestamp_iso_dt)), BigInteger
+    )
+    ordering = (Message.timestamp_iso_dt, Message.id)
+
+    def aggregated(value):
+        return func.string_agg(
+            cast(value, String), aggregate_order_by(literal(","), *ordering)
+        )
+
+    seconds, senders = db.execute(
+        select(aggregated(epoch), aggregated(sender_code)).where(*in_conversation)
+    ).one()
+
+    return ConversationColumns(
+        conversation_id,
+        username,
+        generation,
+        sender_names,
+        _parse_integers(seconds, np.int64),
+        _parse_integers(senders, np.uint8),
+    )
+
+
+class ColumnStore:
+    """LRU of loaded conversations, evicted to stay within a byte budget."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._ids_by_username = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id, generation):
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None or entry.generation != generation:
+                return None
+            self._entries.move_to_end(conversation_id)
+            return entry
+
+    def id_for(self, username):
+        with self._lock:
+            return self._ids_by_username.get(username)
+
+    def put(self, entry):
+        """Keeps `entry` unless it alone exceeds the budget."""
+        with self._lock:
+            self._remove(entry.conversation_id)
+            if entry.nbytes > self.max_bytes:
+                return
+            self._entries[entry.conversation_id] = entry
+            self._ids_by_username[entry.username] = entry.conversation_id
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, conversation_id):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+            self._ids_by_username.pop(entry.username, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "conversations": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+store = (
+    ColumnStore(int(ANALYTICS_MEMORY_MB * 1024 * 1024))
+    if ANALYTICS_MEMORY_MB > 0
+    else None
+)
+
+
+def _generation(db):
+    """cache.current_generation, read through `db` so async callers work too."""
+    generation = cache.fresh_generation()
+    if generation is not None:
+        return generation
+    try:
+        value = db.execute(cache.GENERATION_QUERY).scalar() or 0
+    except Exception:
+        value = None
+    return cache.record_generation(value)
+
+
+def conversation_columns(db, conversation_id=None, username=None):
+    """
+    Returns the columns of a conversation, loading them on first use.
+
+    Pass either the conversation id or its username. Entries loaded before
+    the data generation last changed are reloaded.
+
+    Returns:
+        ConversationColumns: Or None when the engine is off or the
+        conversation does not exist, in which case callers query SQL.
+    """
+    if store is None:
+        return None
+    if conversation_id is None:
+        conversation_id = store.id_for(username)
+        if conversation_id is None:
+            conversation_id = db.execute(
+                select(Conversation.id).where(Conversation.username == username)
+            ).scalar()
+            if conversation_id is None:
+                return None
+    conversation_id = int(conversation_id)
+
+    generation = _generation(db)
+    entry = store.get(conversation_id, generation)
+    if entry is None:
+        entry = load_conversation(db, conversation_id, generation)
+        if entry is not None:
+            store.put(entry)
+    return entry
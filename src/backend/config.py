@@ -1,9 +1,38 @@
 # --- Database Configuration ---
 import os
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 DATABASE_URL = os.environ.get("SUPABASE_CONNECTION_STRING")
-engine = create_engine(DATABASE_URL)
+
+# Connection pool per worker process. Set DB_POOL_SIZE=0 to disable pooling
+# when connecting through Supabase's transaction-mode PgBouncer, which pools
+# server connections itself.
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "5"))
+POOL_TIMEOUT_SECONDS = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# Test connections before use and replace them before Supabase/PgBouncer
+# closes them as idle, instead of failing the first request afterwards
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true")
+POOL_RECYCLE_SECONDS = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+
+
+def pool_options():
+    """Keyword arguments for create_engine from the DB_POOL_* settings."""
+    if POOL_SIZE <= 0:
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": POOL_MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT_SECONDS,
+        "pool_pre_ping": POOL_PRE_PING,
+        "pool_recycle": POOL_RECYCLE_SECONDS,
+    }
+
+
+engine = create_engine(DATABASE_URL, **pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+
+# Export timestamps are naive local times of the account that downloaded them
+MESSAGE_TIMEZONE = os.environ.get("MESSAGE_TIMEZONE", "America/Los_Angeles")
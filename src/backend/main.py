@@ -1,8 +1,13 @@
 from flask import Flask
+from backend import metrics
+from backend.config import engine
 from backend.routes.v1 import v1
+from backend.session import init_app
 
 app = Flask(__name__)
 app.register_blueprint(v1, url_prefix="/v1")
+init_app(app)
+metrics.init_app(app, engine)
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5234, debug=True)
@@ -0,0 +1,284 @@
+# --- Request Metrics ---
+import contextvars
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import event
+from backend.session import pool_stats
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Cumulative counters of backend.session.pool_stats; the rest are gauges
+POOL_COUNTERS = {
+    "checkouts": "db_pool_checkouts_total",
+    "checkout_timeouts": "db_pool_checkout_timeouts_total",
+    "checkout_wait_seconds_total": "db_pool_checkout_wait_seconds_total",
+}
+
+# Opt-in sampling profiler: requests slower than this many milliseconds get
+# their sampled stacks written to PROFILE_DIR. 0 leaves the profiler off.
+PROFILE_SLOW_REQUEST_MS = float(os.environ.get("PROFILE_SLOW_REQUEST_MS", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get(
+    "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "insta_dm_profiles")
+)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram with one series per label set."""
+
+    def __init__(self, name, description, label_names, buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One count per bucket, then the running sum and total count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(
+                (labels, list(values)) for labels, values in self._series.items()
+            )
+        for labels, values in series:
+            label_text = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.label_names, labels)
+            )
+            prefix = f"{label_text}," if label_text else ""
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {round(values[-2], 6)}")
+            lines.append(f"{self.name}_count{{{label_text}}} {values[-1]}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route, method and status.",
+    ("route", "method", "status"),
+    LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed per request, by route.",
+    ("route",),
+    QUERY_COUNT_BUCKETS,
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duration of each SQL statement, by the route that issued it.",
+    ("route",),
+    LATENCY_BUCKETS,
+)
+
+
+class RequestStats:
+    """Timing and query counters of the request being served."""
+
+    __slots__ = ("route", "started", "query_count", "query_seconds")
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+
+# A context variable rather than a thread-local so the async app's
+# concurrent queries are attributed to the request that awaited them
+_current_request = contextvars.ContextVar("request_stats", default=None)
+
+
+def route_label(request):
+    """The matched URL rule, so every unknown path shares one series."""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def start_request(route):
+    _current_request.set(RequestStats(route))
+    if sampler is not None:
+        sampler.add_thread()
+
+
+def finish_request(method, status):
+    """Records the finished request; a no-op if start_request never ran."""
+    stats = _current_request.get()
+    if stats is None:
+        return
+    _current_request.set(None)
+    elapsed = time.perf_counter() - stats.started
+    REQUEST_DURATION.observe((stats.route, method, str(status)), elapsed)
+    REQUEST_QUERIES.observe((stats.route,), stats.query_count)
+    if sampler is not None:
+        samples = sampler.remove_thread()
+        if elapsed * 1000 >= PROFILE_SLOW_REQUEST_MS:
+            dump_profile(stats, method, status, elapsed, samples)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.query_count += 1
+        stats.query_seconds += elapsed
+        QUERY_DURATION.observe((stats.route,), elapsed)
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get("query_started")
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    """Times every statement `engine` executes (pass a sync Engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def render_metrics(pool_engine):
+    """
+    Renders all metrics in the Prometheus text format.
+
+    Values are per worker process; each scrape reports the worker that
+    answered it.
+    """
+    lines = []
+    for histogram in (REQUEST_DURATION, REQUEST_QUERIES, QUERY_DURATION):
+        lines.extend(histogram.render())
+    for name, value in sorted(pool_stats(pool_engine).items()):
+        if name in POOL_COUNTERS:
+            metric, kind = POOL_COUNTERS[name], "counter"
+        elif name.startswith("pool_"):
+            metric, kind = f"db_{name}", "gauge"
+        else:
+            metric, kind = f"db_pool_{name}", "gauge"
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """
+    Samples the Python stack of every thread that is serving a request.
+
+    A daemon thread wakes every `interval` seconds and counts each
+    registered thread's current stack, collapsed to "file:function;..."
+    from the outermost frame in, the input format of flame graph tools.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_thread(self):
+        with self._lock:
+            self._samples[threading.get_ident()] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def remove_thread(self):
+        with self._lock:
+            return self._samples.pop(threading.get_ident(), Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, samples in self._samples.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[collapse_stack(frame)] += 1
+
+
+def collapse_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def dump_profile(stats, method, status, elapsed, samples):
+    """Writes the sampled stacks of a slow request to PROFILE_DIR."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = re.sub(r"[^A-Za-z0-9]+", "_", stats.route).strip("_")
+    name = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{route}-{elapsed * 1000:.0f}ms.txt"
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path, "w") as file:
+        file.write(
+            f"# {method} {stats.route} -> {status} in {elapsed * 1000:.1f} ms, "
+            f"{stats.query_count} queries taking {stats.query_seconds * 1000:.1f} ms, "
+            f"{sum(samples.values())} samples every {PROFILE_SAMPLE_INTERVAL_MS:g} ms\n"
+        )
+        for stack, count in samples.most_common():
+            file.write(f"{stack} {count}\n")
+    print(
+        f"Slow request {method} {stats.route} took {elapsed * 1000:.0f} ms, stacks in {path}"
+    )
+
+
+# Only threads serving Flask requests can be sampled; the async app serves
+# every request from one event loop thread, so it never enables the sampler
+sampler = None
+
+
+def init_app(app, engine):
+    """
+    Instruments a Flask app and its engine and adds the /metrics endpoint.
+
+    Also starts the slow-request profiler when PROFILE_SLOW_REQUEST_MS is set.
+    """
+    from flask import Response, request
+
+    global sampler
+    if PROFILE_SLOW_REQUEST_MS > 0 and sampler is None:
+        sampler = StackSampler(PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    instrument_engine(engine)
+
+    @app.before_request
+    def start_request_metrics():
+        start_request(route_label(request))
+
+    @app.after_request
+    def finish_request_metrics(response):
+        finish_request(request.method, response.status_code)
+        return response
+
+    @app.route("/metrics")
+    def prometheus_metrics():
+        return Response(render_metrics(engine), mimetype=PROMETHEUS_CONTENT_TYPE)
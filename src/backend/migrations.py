@@ -0,0 +1,344 @@
+# --- Schema Migrations ---
+# Versioned, in-place schema upgrades shared by the SQLite ingest database and
+# Supabase Postgres. Each step inspects the live schema before changing it, so
+# it is safe on fresh databases (where create_all already built the latest
+# shape) as well as on databases created by older versions of this project.
+from sqlalchemy import Boolean, inspect, select, text
+from backend.models import (
+    Base,
+    Conversation,
+    Message,
+    SchemaVersion,
+    SyncedFile,
+    SyncState,
+)
+
+
+def _columns(connection, table_name):
+    return {column["name"] for column in inspect(connection).get_columns(table_name)}
+
+
+def create_missing_tables(connection):
+    """Creates every table in the shared schema that does not exist yet."""
+    Base.metadata.create_all(connection, checkfirst=True)
+
+
+def seed_data_generation(connection):
+    """Ensures the single data_generation row exists."""
+    connection.execute(
+        text(
+            """
+            INSERT INTO data_generation (id, generation)
+            SELECT 1, 0
+            WHERE NOT EXISTS (SELECT 1 FROM data_generation WHERE id = 1)
+            """
+        )
+    )
+
+
+def add_missing_columns(connection):
+    """Adds nullable columns that the shared schema has but the database lacks."""
+    for table in Base.metadata.sorted_tables:
+        existing = _columns(connection, table.name)
+        for column in table.columns:
+            if column.name in existing or column.primary_key:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(
+                text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            )
+
+
+def rename_timestamp_iso(connection):
+    """Renames the SQLite ingest's timestamp_iso column to timestamp_iso_dt."""
+    columns = _columns(connection, "messages")
+    if "timestamp_iso" in columns and "timestamp_iso_dt" not in columns:
+        connection.execute(
+            text("ALTER TABLE messages RENAME COLUMN timestamp_iso TO timestamp_iso_dt")
+        )
+
+
+def assign_conversation_ids(connection):
+    """
+    Gives every conversation an integer id and makes the id unique.
+
+    Conversations without an id are numbered after the current maximum in
+    creation order; the table holds one row per chat, so this is cheap.
+    """
+    conversations = Conversation.__table__
+    next_id = (
+        connection.execute(
+            select(conversations.c.id).order_by(conversations.c.id.desc()).limit(1)
+        ).scalar()
+        or 0
+    ) + 1
+    missing = connection.execute(
+        select(conversations.c.username)
+        .where(conversations.c.id.is_(None))
+        .order_by(conversations.c.created_at, conversations.c.username)
+    ).scalars()
+    for username in list(missing):
+        connection.execute(
+            conversations.update()
+            .where(conversations.c.username == username)
+            .values(id=next_id)
+        )
+        next_id += 1
+
+    inspector = inspect(connection)
+    unique_on_id = any(
+        constraint["column_names"] == ["id"]
+        for constraint in inspector.get_unique_constraints("conversations")
+    ) or any(
+        index["unique"] and index["column_names"] == ["id"]
+        for index in inspector.get_indexes("conversations")
+    )
+    if not unique_on_id:
+        connection.execute(
+            text("CREATE UNIQUE INDEX ux_conversations_id ON conversations (id)")
+        )
+
+
+def backfill_message_conversation_ids(connection):
+    """Points messages at conversations.id and adds the foreign key on Postgres."""
+    connection.execute(
+        text(
+            """
+            UPDATE messages
+            SET conversation_id = (
+                SELECT conversations.id FROM conversations
+                WHERE conversations.username = messages.conversation_username
+            )
+            WHERE conversation_id IS NULL
+            """
+        )
+    )
+    # SQLite cannot add constraints to an existing table
+    if connection.dialect.name == "postgresql" and not any(
+        foreign_key["constrained_columns"] == ["conversation_id"]
+        for foreign_key in inspect(connection).get_foreign_keys("messages")
+    ):
+        connection.execute(
+            text(
+                """
+                ALTER TABLE messages ADD CONSTRAINT fk_messages_conversation_id
+                FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+                """
+            )
+        )
+
+
+def create_message_indexes(connection):
+    """
+    Creates the messages indexes, including (conversation_id, timestamp_iso_dt, sender).
+
+    Indexes whose columns are already covered by the primary key or by an
+    index under another name (e.g. one created by hand) are skipped.
+    """
+    inspector = inspect(connection)
+    covered = [
+        tuple(index["column_names"]) for index in inspector.get_indexes("messages")
+    ]
+    covered.append(
+        tuple(inspector.get_pk_constraint("messages")["constrained_columns"])
+    )
+    for index in Message.__table__.indexes:
+        if tuple(column.name for column in index.columns) not in covered:
+            index.create(connection, checkfirst=True)
+
+
+# Text search configuration of the Postgres tsvector column. 'simple' skips
+# stemming and stop words, which suits short, mixed-language chat messages.
+SEARCH_TEXT_CONFIG = "simple"
+
+SQLITE_SEARCH_INDEX_SQL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        message, content='messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, message)
+        VALUES ('delete', old.id, old.message);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF message ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, message)
+        VALUES ('delete', old.id, old.message);
+        INSERT INTO messages_fts (rowid, message) VALUES (new.id, new.message);
+    END
+    """,
+    # Re-reads every message, also repairing an index left over from
+    # dropped tables
+    "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+)
+
+
+def create_message_search_index(connection):
+    """
+    Adds full-text search over messages.message.
+
+    SQLite gets an FTS5 table kept in sync with 'messages' by triggers.
+    Postgres gets a generated tsvector column with a GIN index. Either way
+    every ingested row is indexed as it is written.
+    """
+    if connection.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_INDEX_SQL:
+            connection.execute(text(statement))
+        return
+
+    if "message_tsv" not in _columns(connection, "messages"):
+        connection.execute(
+            text(
+                f"""
+                ALTER TABLE messages ADD COLUMN message_tsv tsvector
+                GENERATED ALWAYS AS (
+                    to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(message, ''))
+                ) STORED
+                """
+            )
+        )
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_messages_message_tsv "
+            "ON messages USING gin (message_tsv)"
+        )
+    )
+
+
+def create_sync_state(connection):
+    """Creates the table holding db.sync's high-water marks."""
+    SyncState.__table__.create(connection, checkfirst=True)
+
+
+def clear_unparsed_like_timestamps(connection):
+    """
+    Nulls like timestamps that the SQLite ingest stored as raw export text.
+
+    SQLAlchemy cannot read them back as DateTime, so any select of the
+    messages table failed. Postgres columns could never hold them.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    connection.execute(
+        text(
+            """
+            UPDATE messages SET timestamp_liked = NULL
+            WHERE timestamp_liked NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+            """
+        )
+    )
+
+
+def create_synced_files(connection):
+    """Creates the table of ingest files db.sync has copied."""
+    SyncedFile.__table__.create(connection, checkfirst=True)
+
+
+# Columns the first schema declared as TEXT though they hold flags
+TEXT_FLAG_COLUMNS = ("story_reply", "attachment")
+
+
+def _flag_value(column_name):
+    """SQL turning a text flag such as '0', '1' or 'true' into a boolean."""
+    value = f"lower(trim({column_name}))"
+    return (
+        f"CASE WHEN {value} IN ('1', 'true', 't') THEN TRUE "
+        f"WHEN {value} IN ('0', 'false', 'f') THEN FALSE END"
+    )
+
+
+def convert_text_flags(connection):
+    """
+    Stores story_reply and attachment as booleans.
+
+    Databases created from the first schema declared them TEXT, so SQLite
+    kept the parser's booleans as '0' and '1', which SQLAlchemy's Boolean
+    reads back as True. SQLite cannot change a column's type, so the column
+    is rebuilt; Postgres converts it in place.
+    """
+    columns = {
+        column["name"]: column["type"]
+        for column in inspect(connection).get_columns("messages")
+    }
+    for name in TEXT_FLAG_COLUMNS:
+        if isinstance(columns[name], Boolean):
+            continue
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text(
+                    f"ALTER TABLE messages ALTER COLUMN {name} TYPE boolean "
+                    f"USING {_flag_value(name)}"
+                )
+            )
+            continue
+        connection.execute(
+            text(f"ALTER TABLE messages RENAME COLUMN {name} TO {name}_text")
+        )
+        connection.execute(text(f"ALTER TABLE messages ADD COLUMN {name} BOOLEAN"))
+        connection.execute(
+            text(f"UPDATE messages SET {name} = {_flag_value(name + '_text')}")
+        )
+        connection.execute(text(f"ALTER TABLE messages DROP COLUMN {name}_text"))
+
+
+def drop_sync_last_message_id(connection):
+    """Drops sync_state.last_message_id, unused since db.sync follows the manifest."""
+    if "last_message_id" in _columns(connection, "sync_state"):
+        connection.execute(text("ALTER TABLE sync_state DROP COLUMN last_message_id"))
+
+
+# (version, name, step) in the order they are applied. Append new steps only.
+MIGRATIONS = [
+    (1, "create missing tables", create_missing_tables),
+    (2, "seed data generation", seed_data_generation),
+    (3, "rename timestamp_iso to timestamp_iso_dt", rename_timestamp_iso),
+    (4, "add missing columns", add_missing_columns),
+    (5, "assign integer conversation ids", assign_conversation_ids),
+    (6, "backfill messages.conversation_id", backfill_message_conversation_ids),
+    (7, "create message indexes", create_message_indexes),
+    (8, "create message search index", create_message_search_index),
+    (9, "create sync state table", create_sync_state),
+    (10, "clear unparsed like timestamps", clear_unparsed_like_timestamps),
+    (11, "create synced files table", create_synced_files),
+    (12, "store text flags as booleans", convert_text_flags),
+    (13, "drop sync_state.last_message_id", drop_sync_last_message_id),
+]
+
+
+def migrate(engine):
+    """
+    Applies every pending migration, each in its own transaction.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    SchemaVersion.__table__.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(SchemaVersion.version)).scalars())
+
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as connection:
+            step(connection)
+            connection.execute(
+                SchemaVersion.__table__.insert().values(version=version, name=name)
+            )
+        print(f"✅ Applied migration {version}: {name}")
+
+    return max(version for version, _, _ in MIGRATIONS)
+
+
+if __name__ == "__main__":
+    from backend.config import engine
+
+    print(f"Schema is at version {migrate(engine)}.")
@@ -1,5 +1,24 @@
-from sqlalchemy import Column, Integer, Text, DateTime, Boolean, String, BigInteger
-from backend.config import Base
+# --- Database Schema ---
+# The single schema definition for both the local SQLite ingest database and
+# Supabase Postgres. Existing databases are brought up to date by
+# backend.migrations rather than dropped and re-created.
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    Float,
+    Text,
+    Date,
+    DateTime,
+    Boolean,
+    String,
+    BigInteger,
+    func,
+)
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
 
 
 # --- Database Model ---
@@ -7,25 +26,101 @@ class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(BigInteger, ForeignKey("conversations.id"))
     conversation_username = Column(Text)
     sender = Column(Text)
     message = Column(Text)
-    timestamp_iso_dt = Column(DateTime(timezone=False))  # Add the timestamp_iso column
-    story_reply = Column(Text)
+    timestamp = Column(Text)  # Raw export timestamp, e.g. "Apr 26, 2025 10:15 pm"
+    timestamp_iso_dt = Column(DateTime(timezone=False))
+    story_reply = Column(Boolean)
     liked = Column(Boolean)
     timestamp_liked = Column(DateTime)
-    attachment = Column(Text)
+    attachment = Column(Boolean)
     attachment_link = Column(Text)
     reference_account = Column(Text)
     audio = Column(Boolean)
     photo = Column(Boolean)
     video = Column(Boolean)
+    source_file = Column(Text, index=True)
+
+    __table_args__ = (
+        # Every analytics route filters one conversation over a time range
+        Index(
+            "ix_messages_conversation_time_sender",
+            "conversation_id",
+            "timestamp_iso_dt",
+            "sender",
+        ),
+    )
 
 
 class Conversation(Base):
     __tablename__ = "conversations"
 
-    id = Column(BigInteger)
+    id = Column(BigInteger, unique=True)
     username = Column(String, primary_key=True, index=True)
     name = Column(String)
-    created_at = Column(DateTime(timezone=False))
+    created_at = Column(DateTime(timezone=False), server_default=func.now())
+
+
+class MessageCountHourly(Base):
+    __tablename__ = "message_counts_hourly"
+
+    conversation_username = Column(Text, primary_key=True)
+    hour = Column(DateTime(timezone=False), primary_key=True)
+    sender = Column(Text, primary_key=True)
+    message_count = Column(Integer)
+
+
+class MessageTokenCount(Base):
+    __tablename__ = "message_token_counts"
+
+    conversation_username = Column(Text, primary_key=True)
+    day = Column(Date, primary_key=True)
+    token = Column(Text, primary_key=True)
+    token_count = Column(Integer)
+
+
+class DataGeneration(Base):
+    __tablename__ = "data_generation"
+
+    id = Column(Integer, primary_key=True)
+    generation = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime(timezone=False))
+
+
+class IngestedFile(Base):
+    __tablename__ = "ingested_files"
+
+    path = Column(Text, primary_key=True)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Float, nullable=False)
+    content_hash = Column(Text, nullable=False)
+    ingested_at = Column(DateTime(timezone=False))
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(Text, nullable=False)
+    applied_at = Column(DateTime(timezone=False), server_default=func.now())
+
+
+class SyncState(Base):
+    __tablename__ = "sync_state"
+
+    # Kept in the Postgres copy, one row per source synced into it
+    source = Column(Text, primary_key=True)
+    source_generation = Column(BigInteger, nullable=False)
+    synced_at = Column(DateTime(timezone=False))
+
+
+class SyncedFile(Base):
+    __tablename__ = "synced_files"
+
+    # The source's ingested_files entries as of its last sync into Postgres
+    source = Column(Text, primary_key=True)
+    path = Column(Text, primary_key=True)
+    content_hash = Column(Text, nullable=False)
+    ingested_at = Column(DateTime(timezone=False))
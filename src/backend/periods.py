@@ -0,0 +1,61 @@
+# --- Time-of-day Periods ---
+# Timezone and bucket parameters of message_volume_by_period, shared by the
+# SQL queries in backend.routes.v1 and the NumPy engine in backend.columnar.
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Short names accepted by earlier versions of message_volume_by_period
+TIMEZONE_ALIASES = {
+    "pst": "America/Los_Angeles",
+    "est": "America/New_York",
+    "ist": "Asia/Kolkata",
+}
+DEFAULT_PERIOD_BOUNDARIES = (0, 6, 12, 18)
+
+
+def resolve_timezone(name):
+    """
+    Maps a timezone alias or IANA name to a validated IANA name.
+
+    Raises:
+        ValueError: If the name is not a known timezone.
+    """
+    name = TIMEZONE_ALIASES.get(name.lower(), name)
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone {name}.")
+    return name
+
+
+def parse_period_boundaries(value):
+    """
+    Parses bucket start hours such as "0,6,12,18".
+
+    Returns:
+        tuple: Strictly increasing hours between 0 and 23.
+
+    Raises:
+        ValueError: If the list is empty, unordered or out of range.
+    """
+    if not value:
+        return DEFAULT_PERIOD_BOUNDARIES
+    boundaries = tuple(int(part) for part in value.split(","))
+    if not all(0 <= hour <= 23 for hour in boundaries) or list(boundaries) != sorted(
+        set(boundaries)
+    ):
+        raise ValueError(f"Invalid period boundaries {value}.")
+    return boundaries
+
+
+def hour_label(hour):
+    """Formats an hour of the day like "12 AM" or "6 PM"."""
+    return f"{hour % 12 or 12} {'AM' if hour % 24 < 12 else 'PM'}"
+
+
+def period_labels(boundaries):
+    """Labels each bucket "<start> - <end>", the last one wrapping past midnight."""
+    ends = boundaries[1:] + (boundaries[0] + 24,)
+    return [
+        f"{hour_label(start)} - {hour_label(end)}"
+        for start, end in zip(boundaries, ends)
+    ]
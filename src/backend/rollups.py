@@ -0,0 +1,121 @@
+from collections import Counter
+from sqlalchemy import func, or_, text
+from backend.config import SessionLocal
+from backend.models import Message, MessageTokenCount
+from backend.tokens import tokenize
+
+REFRESH_HOURLY_COUNTS_SQL = text(
+    """
+    INSERT INTO message_counts_hourly (conversation_username, hour, sender, message_count)
+    SELECT conversation_username, date_trunc('hour', timestamp_iso_dt), sender, COUNT(*)
+    FROM messages
+    WHERE timestamp_iso_dt IS NOT NULL AND sender IS NOT NULL
+    GROUP BY 1, 2, 3
+    """
+)
+
+
+BUMP_GENERATION_SQL = text(
+    """
+    INSERT INTO data_generation (id, generation, updated_at)
+    VALUES (1, 1, now())
+    ON CONFLICT (id) DO UPDATE
+    SET generation = data_generation.generation + 1, updated_at = now()
+    """
+)
+
+
+def refresh_hourly_counts():
+    """
+    Rebuilds 'message_counts_hourly' from 'messages' in one transaction.
+
+    Run this after loading new messages into Postgres; the local SQLite
+    ingest keeps its own copy up to date in db_main.refresh_hourly_counts.
+    The data generation is bumped in the same transaction so cached
+    responses are invalidated.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM message_counts_hourly"))
+        db.execute(REFRESH_HOURLY_COUNTS_SQL)
+        db.execute(BUMP_GENERATION_SQL)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def word_cloud_messages(db):
+    """Messages that count towards the word cloud, oldest first per conversation."""
+    return (
+        db.query(
+            Message.conversation_username,
+            func.date(Message.timestamp_iso_dt),
+            Message.message,
+        )
+        .filter(
+            Message.timestamp_iso_dt.isnot(None),
+            ~Message.message.like("Reacted % to your message"),
+            or_(Message.story_reply.is_(False)),
+            or_(Message.attachment.is_(None), Message.attachment.isnot(True)),
+            or_(Message.audio.is_(None), Message.audio.is_(False)),
+            or_(Message.photo.is_(None), Message.photo.is_(False)),
+            or_(Message.video.is_(None), Message.video.is_(False)),
+        )
+        .order_by(Message.conversation_username)
+    )
+
+
+def refresh_token_counts(batch_size=10000):
+    """
+    Rebuilds 'message_token_counts' with the shared word-cloud tokenizer.
+
+    Messages are streamed with a server-side cursor and counted one
+    conversation at a time, so memory is bounded by a single conversation's
+    vocabulary.
+    """
+    db = SessionLocal()
+    try:
+        db.execute(text("DELETE FROM message_token_counts"))
+        current_username = None
+        counts = Counter()
+
+        def flush():
+            if counts:
+                db.bulk_insert_mappings(
+                    MessageTokenCount,
+                    [
+                        {
+                            "conversation_username": current_username,
+                            "day": day,
+                            "token": token,
+                            "token_count": count,
+                        }
+                        for (day, token), count in counts.items()
+                    ],
+                )
+                counts.clear()
+
+        for username, day, message in word_cloud_messages(db).yield_per(batch_size):
+            if username != current_username:
+                flush()
+                current_username = username
+            for token in tokenize(message):
+                counts[(day, token)] += 1
+        flush()
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    refresh_hourly_counts()
+    print("✅ message_counts_hourly refreshed.")
+    refresh_token_counts()
+    print("✅ message_token_counts refreshed.")
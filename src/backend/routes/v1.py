@@ -1,13 +1,26 @@
 import hashlib
 import os
-import statistics
-from flask import Blueprint, request, jsonify
-from sqlalchemy import func, or_
-import plotly.graph_objs as go
-import pandas as pd
 from collections import Counter
-from backend.config import SessionLocal
-from backend.models import Message, Conversation
+from datetime import date, datetime
+from flask import Blueprint, request, jsonify
+from sqlalchemy import DateTime, String, and_, case, cast, func, literal
+from backend.cache import cached_route
+from backend.columnar import conversation_columns
+from backend.config import MESSAGE_TIMEZONE
+from backend.periods import (
+    DEFAULT_PERIOD_BOUNDARIES,
+    parse_period_boundaries,
+    period_labels,
+    resolve_timezone,
+)
+from backend.search import parse_search_args, query_search
+from backend.session import get_db, pool_stats
+from backend.models import (
+    Message,
+    Conversation,
+    MessageCountHourly,
+    MessageTokenCount,
+)
 
 v1 = Blueprint("v1", __name__)
 
@@ -17,7 +30,7 @@ def get_username_by_id(db, conversation_id):
     Helper function to get username from Conversation by id.
     Returns username if found, else None.
     """
-    if not conversation_id:
+    if not conversation_id or not conversation_id.isdigit():
         return None
     conversation = (
         db.query(Conversation).filter(Conversation.id == int(conversation_id)).first()
@@ -27,16 +40,493 @@ def get_username_by_id(db, conversation_id):
     return None
 
 
+def as_timestamp(value):
+    """
+    Casts a date parameter such as "2025-05-01" to a timestamp in SQL.
+
+    psycopg2 sends strings untyped and Postgres coerces them to the column's
+    type, but asyncpg binds them as varchar, which cannot be compared with a
+    timestamp or date column.
+    """
+    return cast(literal(value, String), DateTime)
+
+
+def query_volume_by_period(
+    db,
+    conversation_id,
+    start_date_str,
+    end_date_str,
+    timezone,
+    boundaries=DEFAULT_PERIOD_BOUNDARIES,
+):
+    """
+    Counts messages per sender in time-of-day buckets, grouped in the database.
+
+    Stored timestamps are converted from MESSAGE_TIMEZONE to `timezone` with
+    AT TIME ZONE, so DST is honoured, and the hour is mapped to a bucket with
+    a CASE expression. Only one row per (bucket, sender) comes back. Hours
+    before the first boundary fall into the last bucket.
+
+    Returns:
+        dict: Period label -> {"self", "unknown", "total"} counts.
+    """
+    columns = conversation_columns(db, conversation_id)
+    if columns is not None:
+        return columns.volume_by_period(
+            start_date_str, end_date_str, timezone, boundaries
+        )
+
+    local_time = func.timezone(
+        timezone, func.timezone(MESSAGE_TIMEZONE, Message.timestamp_iso_dt)
+    )
+    local_hour = func.extract("hour", local_time)
+    last_bucket = len(boundaries) - 1
+    bucket = case(
+        *[
+            (local_hour >= start, index)
+            for index, start in reversed(list(enumerate(boundaries)))
+        ],
+        else_=last_bucket,
+    ).label("bucket")
+
+    rows = (
+        db.query(bucket, Message.sender, func.count())
+        .filter(
+            Message.conversation_id == conversation_id,
+            Message.timestamp_iso_dt >= as_timestamp(start_date_str),
+            Message.timestamp_iso_dt <= as_timestamp(end_date_str),
+        )
+        .group_by(bucket, Message.sender)
+        .all()
+    )
+
+    labels = period_labels(boundaries)
+    volume_by_period = {
+        label: {"self": 0, "unknown": 0, "total": 0} for label in labels
+    }
+    for index, sender, count in rows:
+        period = volume_by_period[labels[index]]
+        period["total"] += count
+        if sender in period:
+            period[sender] += count
+    return volume_by_period
+
+
+DEFAULT_MAX_RESPONSE_SECONDS = 86400  # 1 day
+
+
+def parse_percentiles(value):
+    """
+    Parses a comma-separated percentile list such as "50,90,99".
+
+    Returns:
+        tuple: The requested percentiles, sorted.
+
+    Raises:
+        ValueError: If a value is not a number between 0 and 100.
+    """
+    percentiles = set()
+    for part in (value or "").split(","):
+        if part.strip():
+            percentile = float(part)
+            if not 0 <= percentile <= 100:
+                raise ValueError(f"Percentile {part} is outside 0-100.")
+            percentiles.add(int(percentile) if percentile.is_integer() else percentile)
+    return tuple(sorted(percentiles))
+
+
+def query_response_times(
+    db,
+    conversation_id,
+    start_date_str,
+    end_date_str,
+    percentiles=(),
+    max_seconds=DEFAULT_MAX_RESPONSE_SECONDS,
+):
+    """
+    Computes reply-time statistics per sender inside the database.
+
+    A reply is a message whose previous message (by timestamp) came from the
+    other sender; its delay is the gap between the two. LAG pairs each
+    message with its predecessor, gaps above `max_seconds` are dropped as
+    outliers, and only one aggregate row per sender comes back.
+
+    Returns:
+        dict: avg_<sender>, median_<sender> and p<N>_<sender> for each requested
+        percentile, in seconds rounded to two decimals, or None where a sender
+        never replied.
+    """
+    columns = conversation_columns(db, conversation_id)
+    if columns is not None:
+        return columns.response_times(
+            start_date_str, end_date_str, percentiles, max_seconds
+        )
+
+    # The median is always computed as the 50th percentile
+    computed = tuple(sorted(set(percentiles) | {50}))
+    ordering = (Message.timestamp_iso_dt, Message.id)
+    ordered = (
+        db.query(
+            Message.sender.label("sender"),
+            func.lag(Message.sender).over(order_by=ordering).label("prev_sender"),
+            func.extract(
+                "epoch",
+                Message.timestamp_iso_dt
+                - func.lag(Message.timestamp_iso_dt).over(order_by=ordering),
+            ).label("delta"),
+        )
+        .filter(
+            Message.conversation_id == conversation_id,
+            Message.timestamp_iso_dt >= as_timestamp(start_date_str),
+            Message.timestamp_iso_dt <= as_timestamp(end_date_str),
+            Message.timestamp_iso_dt.isnot(None),
+            Message.sender.isnot(None),
+        )
+        .subquery()
+    )
+
+    rows = (
+        db.query(
+            ordered.c.sender,
+            func.avg(ordered.c.delta),
+            *[
+                func.percentile_cont(percentile / 100).within_group(ordered.c.delta)
+                for percentile in computed
+            ],
+        )
+        .filter(
+            ordered.c.prev_sender != ordered.c.sender,
+            ordered.c.delta <= max_seconds,
+        )
+        .group_by(ordered.c.sender)
+        .all()
+    )
+
+    def rounded(value):
+        return round(float(value), 2) if value is not None else None
+
+    response_times = {}
+    for sender in ("self", "unknown"):
+        response_times[f"avg_{sender}"] = None
+        response_times[f"median_{sender}"] = None
+        for percentile in percentiles:
+            response_times[f"p{percentile}_{sender}"] = None
+
+    for sender, average, *values in rows:
+        by_percentile = dict(zip(computed, values))
+        response_times[f"avg_{sender}"] = rounded(average)
+        response_times[f"median_{sender}"] = rounded(by_percentile[50])
+        for percentile in percentiles:
+            response_times[f"p{percentile}_{sender}"] = rounded(
+                by_percentile[percentile]
+            )
+
+    return response_times
+
+
+# Chart routes return a Plotly figure by default; "data" skips building it
+RESPONSE_FORMATS = ("figure", "data")
+
+
+def parse_response_format(value):
+    """
+    Validates the `format` query parameter of the chart routes.
+
+    Raises:
+        ValueError: If the format is not one of RESPONSE_FORMATS.
+    """
+    value = value or "figure"
+    if value not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown format {value}.")
+    return value
+
+
+def graph_objs():
+    """
+    Imports plotly.graph_objs on first use.
+
+    Plotly takes a large share of worker start-up time, so it is only loaded
+    once a figure is actually requested.
+    """
+    import plotly.graph_objs as go
+
+    return go
+
+
+def query_monthly_volume(db, username=None):
+    """
+    Sums the hourly rollup per month, for one conversation or all of them.
+
+    Returns:
+        tuple: Month labels like "May 25" in order, and the matching counts.
+    """
+    columns = conversation_columns(db, username=username) if username else None
+    if columns is not None:
+        return columns.monthly_volume()
+
+    query = db.query(
+        func.to_char(MessageCountHourly.hour, "YYYY-MM").label("month"),
+        func.sum(MessageCountHourly.message_count).label("message_count"),
+    ).group_by("month")
+
+    if username:
+        query = query.filter(MessageCountHourly.conversation_username == username)
+
+    # "YYYY-MM" sorts chronologically
+    results = sorted(query.all())
+    months = [
+        datetime.strptime(month, "%Y-%m").strftime("%b %y") for month, _ in results
+    ]
+    return months, [int(count) for _, count in results]
+
+
+def message_volume_payload(months, message_counts, response_format="figure"):
+    """Builds the message_volume response body."""
+    if response_format == "data":
+        return {
+            "title": "Message Volume Analysis",
+            "data": {"months": months, "message_counts": message_counts},
+        }
+
+    go = graph_objs()
+    fig = go.Figure(data=[go.Bar(x=months, y=message_counts)])
+    fig.update_layout(
+        title="Message Volume Per Month",
+        xaxis_title="Month",
+        yaxis_title="Number of Messages",
+    )
+    return {
+        "title": "Message Volume Analysis",
+        "figure": fig.to_plotly_json(),
+    }
+
+
+def query_top_words(db, username, start_date_str, end_date_str, min_letters=0):
+    """
+    Returns the five most frequent words of a conversation in a date range.
+
+    Token counts are precomputed per conversation and day at ingest, with
+    reactions, story replies, attachments and media already excluded.
+    """
+    total = func.sum(MessageTokenCount.token_count).label("total")
+    top_words = (
+        db.query(MessageTokenCount.token, total)
+        .filter(
+            MessageTokenCount.conversation_username == username,
+            MessageTokenCount.day >= as_timestamp(start_date_str),
+            MessageTokenCount.day <= as_timestamp(end_date_str),
+            func.length(MessageTokenCount.token) >= min_letters,
+        )
+        .group_by(MessageTokenCount.token)
+        .order_by(total.desc(), MessageTokenCount.token)
+        .limit(5)
+        .all()
+    )
+    return [{"word": word, "count": int(count)} for word, count in top_words]
+
+
+def volume_by_period_payload(
+    volume_by_period, start_date_str, end_date_str, response_format="figure"
+):
+    """Builds the message_volume_by_period response body."""
+    periods = list(volume_by_period.keys())
+    self_volumes = [volume_by_period[p]["self"] for p in periods]
+    unknown_volumes = [volume_by_period[p]["unknown"] for p in periods]
+
+    if response_format == "data":
+        return {
+            "title": "Message Volume by Period Analysis",
+            "start_date": start_date_str,
+            "end_date": end_date_str,
+            "data": {
+                "periods": periods,
+                "self": self_volumes,
+                "unknown": unknown_volumes,
+            },
+            "volume_data": volume_by_period,
+        }
+
+    go = graph_objs()
+    fig = go.Figure(
+        data=[
+            go.Bar(name="Aryan", x=periods, y=self_volumes),
+            go.Bar(name="User", x=periods, y=unknown_volumes),
+        ]
+    )
+    fig.update_layout(
+        barmode="group",
+        title=f"Message Volume by Period",
+        xaxis_title="Time Period",
+        yaxis_title="Number of Messages",
+    )
+    return {
+        "title": "Message Volume by Period Analysis",
+        "start_date": start_date_str,
+        "end_date": end_date_str,
+        "figure": fig.to_plotly_json(),  # Use this instead of HTML!
+        "volume_data": volume_by_period,  # This is your raw backend data, JSON-serializable
+    }
+
+
+def query_sender_counts(db, username, start_date_str=None, end_date_str=None):
+    """
+    Totals messages per sender from the hourly rollup in one grouped query.
+
+    Returns:
+        tuple: The "self" and "unknown" message counts.
+    """
+    columns = conversation_columns(db, username=username)
+    if columns is not None:
+        return columns.sender_counts(start_date_str, end_date_str)
+
+    query = (
+        db.query(
+            MessageCountHourly.sender,
+            func.sum(MessageCountHourly.message_count),
+        )
+        .filter(MessageCountHourly.conversation_username == username)
+        .group_by(MessageCountHourly.sender)
+    )
+    if start_date_str:
+        query = query.filter(MessageCountHourly.hour >= as_timestamp(start_date_str))
+    if end_date_str:
+        query = query.filter(MessageCountHourly.hour <= as_timestamp(end_date_str))
+
+    counts = dict(query.all())
+    return int(counts.get("self") or 0), int(counts.get("unknown") or 0)
+
+
+def message_comparison_payload(
+    self_count, unknown_count, start_date_str, end_date_str, response_format="figure"
+):
+    """Builds the message_comparison response body."""
+    labels = ["Aryan", "User"]
+    values = [self_count, unknown_count]
+    meta = {"start_date": start_date_str, "end_date": end_date_str}
+
+    if response_format == "data":
+        return {"data": {"labels": labels, "values": values}, "meta": meta}
+
+    # Create a pie chart
+    go = graph_objs()
+    fig = go.Figure(
+        data=[
+            go.Pie(
+                labels=labels,
+                values=values,
+                hoverinfo="label+percent",
+                textinfo="value",
+                insidetextorientation="radial",
+            ),
+        ]
+    )
+    fig.update_layout(
+        title=f"Message Proportion",
+    )
+    return {"figure": fig.to_plotly_json(), "meta": meta}
+
+
+SUMMARY_METRICS = (
+    "message_comparison",
+    "message_volume",
+    "message_volume_by_period",
+    "average_response_time",
+)
+
+
+def query_summary_counts(db, conversation_id, start_date_str, end_date_str):
+    """
+    Resolves the conversation and fetches its hourly counts in one round trip.
+
+    Returns:
+        list: (username, hour, sender, message_count) rows, one row with a
+        None hour if the range is empty, or no rows if the conversation does
+        not exist.
+    """
+    return (
+        db.query(
+            Conversation.username,
+            MessageCountHourly.hour,
+            MessageCountHourly.sender,
+            MessageCountHourly.message_count,
+        )
+        .outerjoin(
+            MessageCountHourly,
+            and_(
+                MessageCountHourly.conversation_username == Conversation.username,
+                MessageCountHourly.hour >= as_timestamp(start_date_str),
+                MessageCountHourly.hour <= as_timestamp(end_date_str),
+            ),
+        )
+        .filter(Conversation.id == conversation_id)
+        .all()
+    )
+
+
+def summarize_hourly_counts(rows, metrics):
+    """
+    Derives the message_comparison and message_volume summary metrics from
+    the rows of query_summary_counts.
+    """
+    hourly_counts = [row for row in rows if row.hour is not None]
+    results = {}
+
+    if "message_comparison" in metrics:
+        sender_counts = {"self": 0, "unknown": 0}
+        for row in hourly_counts:
+            if row.sender in sender_counts:
+                sender_counts[row.sender] += row.message_count
+        results["message_comparison"] = sender_counts
+
+    if "message_volume" in metrics:
+        monthly_counts = Counter()
+        for row in hourly_counts:
+            monthly_counts[(row.hour.year, row.hour.month)] += row.message_count
+        months = sorted(monthly_counts)
+        results["message_volume"] = {
+            "months": [
+                date(year, month, 1).strftime("%b %y") for year, month in months
+            ],
+            "message_counts": [monthly_counts[month] for month in months],
+        }
+
+    return results
+
+
+def query_summary_metrics(db, conversation_id, start_date_str, end_date_str, metrics):
+    """
+    Computes the message_comparison and message_volume summary metrics.
+
+    Returns:
+        dict: Metric name -> value, or None if the conversation does not exist.
+    """
+    columns = conversation_columns(db, conversation_id)
+    if columns is not None:
+        return columns.summary_metrics(start_date_str, end_date_str, metrics)
+
+    rows = query_summary_counts(db, conversation_id, start_date_str, end_date_str)
+    if not rows:
+        return None
+    return summarize_hourly_counts(rows, metrics)
+
+
 def hash_string(s):
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
 
 @v1.route("/message_volume")
+@cached_route
 def message_volume():
     """
     Displays a Plotly graph of message volume per month, filterable by conversation id.
+
+    `format=data` returns the months and counts as arrays instead of a figure.
     """
-    db = SessionLocal()
+    try:
+        response_format = parse_response_format(request.args.get("format"))
+    except ValueError as e:
+        return f"{e}", 400
+    db = get_db()
 
     conversation_id = request.args.get("id")  # Get id from query parameter
     username_filter = get_username_by_id(db, conversation_id)
@@ -44,51 +534,21 @@ def message_volume():
         return f"Conversation with id {conversation_id} not found.", 404
 
     try:
-        query = db.query(
-            func.to_char(Message.timestamp_iso_dt, "YYYY-MM").label("month"),
-            func.count().label("message_count"),
-        ).group_by("month")
-
-        if username_filter:
-            query = query.filter(Message.conversation_username == username_filter)
-
-        results = query.all()
-
-        # Convert results to a pandas DataFrame for easier Plotly plotting
-        df = pd.DataFrame(results, columns=["month", "message_count"])
-        df["month"] = pd.to_datetime(df["month"])
-        # Extract month name from the 'month' column (e.g., "May" from "Mon, May 01 2025, 00:00:00 GMT")
-        df = df.sort_values("month")
-        df["month"] = df["month"].dt.strftime("%b %y")
-
-        fig = go.Figure(
-            data=[go.Bar(x=df["month"].tolist(), y=df["message_count"].tolist())]
-        )
-        fig.update_layout(
-            title="Message Volume Per Month",
-            xaxis_title="Month",
-            yaxis_title="Number of Messages",
-        )
-
-        return jsonify(
-            {
-                "title": "Message Volume Analysis",
-                "figure": fig.to_plotly_json(),
-            }
-        )
+        # Summed from the hourly rollup rather than counting raw messages
+        months, message_counts = query_monthly_volume(db, username_filter)
+        return jsonify(message_volume_payload(months, message_counts, response_format))
 
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
 
 
 @v1.route("/word_cloud")
+@cached_route
 def word_cloud():
     """
     Analyzes messages for a given conversation id and date range to find the most frequent words.
     """
-    db = SessionLocal()
+    db = get_db()
     conversation_id = request.args.get("id")
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
@@ -105,128 +565,35 @@ def word_cloud():
         )
 
     try:
-        # Base query filtered by conversation and date range
-        query = db.query(Message.message).filter(
-            Message.conversation_username == username,
-            Message.timestamp_iso_dt >= start_date_str,
-            Message.timestamp_iso_dt <= end_date_str,
-        )
-        # Exclude messages that are reactions, have attachments, or are audio/photo/video
-        query = query.filter(
-            ~Message.message.like("Reacted % to your message"),
-            or_(Message.story_reply.is_(False)),
-            or_(Message.attachment.is_(None), Message.attachment.isnot(True)),
-            or_(Message.audio.is_(None), Message.audio.is_(False)),
-            or_(Message.photo.is_(None), Message.photo.is_(False)),
-            or_(Message.video.is_(None), Message.video.is_(False)),
-        )
-
-        messages = query.all()
-
-        if not messages:
-            return jsonify({"top_words": []})
-
-        # Combine all messages into a single string
-        all_messages_text = " ".join([m[0] for m in messages if m[0]])
-
-        # Simple tokenization and lowercasing
-        words = all_messages_text.lower().split()
-
-        # Define common English stop words (can be expanded)
-        stop_words = set(
-            [
-                "the",
-                "a",
-                "an",
-                "is",
-                "it",
-                "in",
-                "on",
-                "at",
-                "for",
-                "with",
-                "and",
-                "or",
-                "but",
-                "not",
-                "i",
-                "you",
-                "he",
-                "she",
-                "it",
-                "we",
-                "they",
-                "my",
-                "your",
-                "his",
-                "her",
-                "its",
-                "our",
-                "their",
-                "to",
-                "of",
-                "from",
-                "by",
-                "as",
-                "so",
-                "that",
-                "this",
-                "these",
-                "those",
-                "be",
-                "am",
-                "are",
-                "was",
-                "were",
-                "been",
-                "have",
-                "has",
-                "had",
-                "do",
-                "does",
-                "did",
-                "can",
-                "could",
-                "will",
-                "would",
-                "get",
-                "like",
-            ]
-        )
-
-        # Filter out stop words and punctuation
-        filtered_words = [
-            word
-            for word in words
-            if word not in stop_words and word.isalnum() and len(word) >= min_letters
-        ]
-
-        # Count word frequencies
-        word_counts = Counter(filtered_words)
-
-        # Get the top 5 most frequent words
-        top_words = word_counts.most_common(5)
-
-        return jsonify(
-            {"top_words": [{"word": word, "count": count} for word, count in top_words]}
+        top_words = query_top_words(
+            db, username, start_date_str, end_date_str, min_letters
         )
+        return jsonify({"top_words": top_words})
 
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
 
 
 @v1.route("/message_volume_by_period")
+@cached_route
 def message_volume_by_period():
     """
     Calculates and displays the message volume by time period for a given conversation id and date range.
+
+    `timezone` takes an IANA name (or pst/est/ist) and `boundaries` the bucket
+    start hours, defaulting to "0,6,12,18". `format=data` returns the
+    per-period counts as arrays instead of a figure.
     """
-    db = SessionLocal()
     conversation_id = request.args.get("id")
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
-    timezone = request.args.get("timezone", "pst")
+    try:
+        timezone = resolve_timezone(request.args.get("timezone", "pst"))
+        boundaries = parse_period_boundaries(request.args.get("boundaries"))
+        response_format = parse_response_format(request.args.get("format"))
+    except ValueError as e:
+        return f"{e}", 400
+    db = get_db()
     username_filter = get_username_by_id(db, conversation_id)
 
     if not username_filter or not start_date_str or not end_date_str:
@@ -236,100 +603,38 @@ def message_volume_by_period():
         )
 
     try:
-        # Query only the columns we actually use: timestamp_iso_dt and sender
-        query = db.query(Message.timestamp_iso_dt, Message.sender).filter(
-            Message.conversation_username == username_filter,
-            Message.timestamp_iso_dt >= start_date_str,
-            Message.timestamp_iso_dt <= end_date_str,
+        volume_by_period = query_volume_by_period(
+            db,
+            int(conversation_id),
+            start_date_str,
+            end_date_str,
+            timezone,
+            boundaries,
         )
-        messages = query.all()
-
-        # Initialize volume counts for each period and sender
-        volume_by_period = {
-            "12 AM - 6 AM": {"self": 0, "unknown": 0, "total": 0},
-            "6 AM - 12 PM": {"self": 0, "unknown": 0, "total": 0},
-            "12 PM - 6 PM": {"self": 0, "unknown": 0, "total": 0},
-            "6 PM - 12 AM": {"self": 0, "unknown": 0, "total": 0},
-        }
-
-        for message in messages:
-            try:
-                timestamp = message.timestamp_iso_dt
-                # Adjust hour based on timezone
-                hour = timestamp.hour
-                minute = timestamp.minute
-                if timezone.lower() == "ist":
-                    # IST is 12.5 hours ahead of PST
-                    total_minutes = hour * 60 + minute + 750  # 12*60 + 30 = 750
-                    hour = (total_minutes // 60) % 24
-                    minute = total_minutes % 60
-                elif timezone.lower() == "est":
-                    # EST is 3 hours ahead of PST
-                    total_minutes = hour * 60 + minute + 180  # 3*60 = 180
-                    hour = (total_minutes // 60) % 24
-                    minute = total_minutes % 60
-                sender = message.sender
-
-                if 0 <= hour < 6:
-                    period = "12 AM - 6 AM"
-                elif 6 <= hour < 12:
-                    period = "6 AM - 12 PM"
-                elif 12 <= hour < 18:
-                    period = "12 PM - 6 PM"
-                elif 18 <= hour < 24:
-                    period = "6 PM - 12 AM"
-                else:
-                    continue  # Should not happen
-
-                volume_by_period[period]["total"] += 1
-                if sender in volume_by_period[period]:
-                    volume_by_period[period][sender] += 1
-
-            except Exception:
-                # Skip messages with invalid timestamps
-                continue
-
-        # Prepare data for Plotly chart
-        periods = list(volume_by_period.keys())
-        self_volumes = [volume_by_period[p]["self"] for p in periods]
-        unknown_volumes = [volume_by_period[p]["unknown"] for p in periods]
-
-        fig = go.Figure(
-            data=[
-                go.Bar(name="Aryan", x=periods, y=self_volumes),
-                go.Bar(name="User", x=periods, y=unknown_volumes),
-            ]
-        )
-        fig.update_layout(
-            barmode="group",
-            title=f"Message Volume by Period",
-            xaxis_title="Time Period",
-            yaxis_title="Number of Messages",
-        )
-
         return jsonify(
-            {
-                "title": "Message Volume by Period Analysis",
-                "start_date": start_date_str,
-                "end_date": end_date_str,
-                "figure": fig.to_plotly_json(),  # Use this instead of HTML!
-                "volume_data": volume_by_period,  # This is your raw backend data, JSON-serializable
-            }
+            volume_by_period_payload(
+                volume_by_period, start_date_str, end_date_str, response_format
+            )
         )
 
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
 
 
 @v1.route("/message_comparison")
+@cached_route
 def message_comparison():
     """
     Displays a Plotly pie chart comparing the proportion of messages
     sent by "self" and "unknown" within a conversation and date range.
+
+    `format=data` returns the labels and counts instead of a figure.
     """
-    db = SessionLocal()
+    try:
+        response_format = parse_response_format(request.args.get("format"))
+    except ValueError as e:
+        return f"{e}", 400
+    db = get_db()
     conversation_id = request.args.get("id")
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
@@ -342,71 +647,46 @@ def message_comparison():
         )
 
     try:
-        # Base query filtered by conversation and date range
-        query = db.query(Message)
-        if username_filter:
-            query = query.filter(Message.conversation_username == username_filter)
-        if start_date_str:
-            query = query.filter(Message.timestamp_iso_dt >= start_date_str)
-        if end_date_str:
-            query = query.filter(Message.timestamp_iso_dt <= end_date_str)
-
-        # Count messages for "self" and "unknown"
-        self_count = query.filter(Message.sender == "self").count()
-        unknown_count = query.filter(Message.sender == "unknown").count()
-
-        total_messages = self_count + unknown_count
-
-        if total_messages == 0:
-            return "No messages found for the specified criteria.", 404
-
-        labels = ["Aryan", "User"]
-        values = [self_count, unknown_count]
-
-        # Create a pie chart
-        fig = go.Figure(
-            data=[
-                go.Pie(
-                    labels=labels,
-                    values=values,
-                    hoverinfo="label+percent",
-                    textinfo="value",
-                    insidetextorientation="radial",
-                ),
-            ]
-        )
-
-        # Update layout
-        fig.update_layout(
-            title=f"Message Proportion",
+        self_count, unknown_count = query_sender_counts(
+            db, username_filter, start_date_str, end_date_str
         )
+        if self_count + unknown_count == 0:
+            return "No messages found for the specified criteria.", 404
 
-        fig_json = fig.to_plotly_json()
         return jsonify(
-            {
-                "figure": fig_json,
-                "meta": {
-                    "start_date": start_date_str,
-                    "end_date": end_date_str,
-                },
-            }
+            message_comparison_payload(
+                self_count,
+                unknown_count,
+                start_date_str,
+                end_date_str,
+                response_format,
+            )
         )
 
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
 
 
 @v1.route("/average_response_time")
+@cached_route
 def average_response_time():
     """
     Calculates and displays the average response time for a given conversation and date.
+
+    Optional `percentiles` (e.g. "50,90,99") adds p<N>_self/p<N>_unknown keys,
+    and `max_seconds` (default one day) sets the outlier cutoff.
     """
     conversation_id = request.args.get("id")
     start_str = request.args.get("start_date")
     end_str = request.args.get("end_date")
-    db = SessionLocal()
+    max_seconds = request.args.get(
+        "max_seconds", DEFAULT_MAX_RESPONSE_SECONDS, type=float
+    )
+    try:
+        percentiles = parse_percentiles(request.args.get("percentiles"))
+    except ValueError:
+        return "Invalid 'percentiles' parameter", 400
+    db = get_db()
     username_filter = get_username_by_id(db, conversation_id)
     start_dt = start_str if start_str else "Start date not provided"
     end_dt = end_str if end_str else "End date not provided"
@@ -415,91 +695,155 @@ def average_response_time():
         return "Missing required query parameters", 400
 
     try:
-        messages = (
-            db.query(Message.timestamp_iso_dt, Message.sender)
-            .filter(
-                Message.conversation_username == username_filter,
-                Message.timestamp_iso_dt >= start_str,
-                Message.timestamp_iso_dt <= end_str,
-            )
-            .order_by(Message.timestamp_iso_dt)
-            .all()
+        response_times = query_response_times(
+            db, int(conversation_id), start_str, end_str, percentiles, max_seconds
         )
 
-        prev_sender = None
-        prev_time = None
-        response_durations = {"self": [], "unknown": []}
-
-        for ts, sender in messages:
-            if ts is None or sender is None:
-                continue
-            try:
-                cur_time = ts
-            except Exception:
-                continue
-
-            if prev_sender and prev_sender != sender:
-                delta = (cur_time - prev_time).total_seconds()
-                response_durations[sender].append(delta)
-            prev_sender = sender
-            prev_time = cur_time
-
-        MAX_SECONDS = 86400  # 1 day
-
-        # Filter out values > 1 day for average calculation
-        filtered_self = [d for d in response_durations["self"] if d <= MAX_SECONDS]
-        filtered_unknown = [
-            d for d in response_durations["unknown"] if d <= MAX_SECONDS
-        ]
+        return jsonify(
+            {
+                "start_dt": start_dt,
+                "end_dt": end_dt,
+                "max_seconds": max_seconds,
+                **response_times,
+            }
+        )
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
 
-        # Median includes all values
-        median_self = statistics.median(filtered_self) if filtered_self else None
-        median_unknown = (
-            statistics.median(filtered_unknown) if filtered_unknown else None
+
+@v1.route("/summary")
+@cached_route
+def summary():
+    """
+    Returns several conversation metrics for one date range in a single call.
+
+    Query parameters: id, start_date, end_date, optional timezone, boundaries,
+    percentiles, max_seconds and metrics (comma-separated subset of
+    SUMMARY_METRICS, default all). Monthly volume and sender comparison come
+    from one query over the hourly rollup joined to the conversation; period
+    buckets and response times each add one grouped query when requested.
+    Conversations held by backend.columnar are answered without any of them.
+    """
+    conversation_id = request.args.get("id")
+    start_date_str = request.args.get("start_date")
+    end_date_str = request.args.get("end_date")
+    metrics = request.args.get("metrics", ",".join(SUMMARY_METRICS)).split(",")
+    max_seconds = request.args.get(
+        "max_seconds", DEFAULT_MAX_RESPONSE_SECONDS, type=float
+    )
+
+    if not conversation_id or not start_date_str or not end_date_str:
+        return (
+            "Please provide 'id', 'start_date', and 'end_date' parameters.",
+            400,
         )
+    if not conversation_id.isdigit():
+        return f"Invalid conversation id {conversation_id}.", 400
+    unknown_metrics = [metric for metric in metrics if metric not in SUMMARY_METRICS]
+    if unknown_metrics:
+        return f"Unknown metrics: {', '.join(unknown_metrics)}.", 400
+    try:
+        percentiles = parse_percentiles(request.args.get("percentiles"))
+    except ValueError:
+        return "Invalid 'percentiles' parameter", 400
+    try:
+        timezone = resolve_timezone(request.args.get("timezone", "pst"))
+        boundaries = parse_period_boundaries(request.args.get("boundaries"))
+    except ValueError as e:
+        return f"{e}", 400
 
-        # Average (mean), excluding outliers
-        avg_self = sum(filtered_self) / len(filtered_self) if filtered_self else None
-        avg_unknown = (
-            sum(filtered_unknown) / len(filtered_unknown) if filtered_unknown else None
+    db = get_db()
+    try:
+        results = query_summary_metrics(
+            db, int(conversation_id), start_date_str, end_date_str, metrics
         )
+        if results is None:
+            return f"Conversation with id {conversation_id} not found.", 404
+
+        if "message_volume_by_period" in metrics:
+            results["message_volume_by_period"] = query_volume_by_period(
+                db,
+                int(conversation_id),
+                start_date_str,
+                end_date_str,
+                timezone,
+                boundaries,
+            )
+
+        if "average_response_time" in metrics:
+            results["average_response_time"] = query_response_times(
+                db,
+                int(conversation_id),
+                start_date_str,
+                end_date_str,
+                percentiles,
+                max_seconds,
+            )
 
         return jsonify(
             {
-                "start_dt": start_dt,
-                "end_dt": end_dt,
-                "avg_self": round(avg_self, 2) if avg_self is not None else None,
-                "median_self": (
-                    round(median_self, 2) if median_self is not None else None
-                ),
-                "avg_unknown": (
-                    round(avg_unknown, 2) if avg_unknown is not None else None
-                ),
-                "median_unknown": (
-                    round(median_unknown, 2) if median_unknown is not None else None
-                ),
+                "id": int(conversation_id),
+                "start_date": start_date_str,
+                "end_date": end_date_str,
+                "metrics": results,
             }
         )
 
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
+
+
+@v1.route("/search")
+@cached_route
+def search():
+    """
+    Full-text search over messages, best matches first.
+
+    `q` is required: quoted text matches a phrase and a trailing * a prefix,
+    e.g. `"see you" tomorr*`. Optional `id`, `start_date` and `end_date`
+    narrow the search. Pages hold `limit` results (default 20, at most 100);
+    pass the returned `next_cursor` as `cursor` for the next page.
+    """
+    try:
+        search_args = parse_search_args(request.args)
+    except ValueError as e:
+        return f"{e}", 400
+
+    db = get_db()
+    try:
+        results, next_cursor = query_search(db, **search_args)
+        return jsonify(
+            {
+                "query": request.args.get("q"),
+                "results": results,
+                "next_cursor": next_cursor,
+            }
+        )
+    except Exception as e:
+        return f"An error occurred: {e}", 500
 
 
 @v1.route("/conversation_count")
+@cached_route
 def conversation_count():
     """
     Returns the number of rows in the Conversation table.
     """
-    db = SessionLocal()
+    db = get_db()
     try:
         count = db.query(Conversation).count()
         return jsonify({"conversation_count": count})
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
+
+
+@v1.route("/pool_stats")
+def pool_status():
+    """
+    Returns this worker's connection pool occupancy and checkout-wait counters.
+    """
+    return jsonify(pool_stats())
 
 
 @v1.route("/secret_message")
@@ -539,7 +883,7 @@ def username_exists():
     username = request.args.get("username")
     if not username:
         return jsonify({"error": "Missing 'username' query parameter."}), 400
-    db = SessionLocal()
+    db = get_db()
     try:
         row = db.query(Conversation).filter(Conversation.username == username).first()
         exists = row is not None
@@ -549,5 +893,3 @@ def username_exists():
         return jsonify({"exists": exists, "secret": secret})
     except Exception as e:
         return f"An error occurred: {e}", 500
-    finally:
-        db.close()
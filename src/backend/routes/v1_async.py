@@ -0,0 +1,465 @@
+import asyncio
+import os
+from functools import wraps
+from quart import Blueprint, Response, jsonify, make_response, request
+from backend import cache
+from backend.async_session import async_engine, run_query
+from backend.models import Conversation
+from backend.periods import parse_period_boundaries, resolve_timezone
+from backend.routes.v1 import (
+    DEFAULT_MAX_RESPONSE_SECONDS,
+    SUMMARY_METRICS,
+    get_username_by_id,
+    hash_string,
+    message_comparison_payload,
+    message_volume_payload,
+    parse_percentiles,
+    parse_response_format,
+    query_monthly_volume,
+    query_response_times,
+    query_sender_counts,
+    query_summary_metrics,
+    query_top_words,
+    query_volume_by_period,
+    volume_by_period_payload,
+)
+from backend.search import parse_search_args, query_search
+from backend.session import pool_stats
+
+# Same URLs and response bodies as backend.routes.v1, served from an event
+# loop. Queries and payload builders are shared with the Flask routes; only
+# argument handling and the awaiting of queries live here.
+v1 = Blueprint("v1", __name__)
+
+
+async def current_generation():
+    """Async counterpart of backend.cache.current_generation."""
+    generation = cache.fresh_generation()
+    if generation is not None:
+        return generation
+    try:
+        async with async_engine.connect() as connection:
+            value = (await connection.execute(cache.GENERATION_QUERY)).scalar() or 0
+    except Exception:
+        # Keep serving with the last known generation if the lookup fails
+        value = None
+    return cache.record_generation(value)
+
+
+def cached_route(view):
+    """Async counterpart of backend.cache.cached_route, sharing its backend."""
+
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        key = cache.cache_key(await current_generation(), request.path, request.args)
+        etag = cache.response_etag(key)
+        if request.if_none_match.contains_weak(etag):
+            return cache.tag_response(Response("", status=304), etag)
+
+        cached = cache.backend.get(key) if cache.backend is not None else None
+        if cached is not None:
+            body, status, mimetype = cached
+            return cache.tag_response(
+                Response(body, status=status, mimetype=mimetype), etag
+            )
+
+        response = await make_response(await view(*args, **kwargs))
+        if response.status_code == 200:
+            if cache.backend is not None:
+                cache.backend.set(
+                    key, (await response.get_data(), 200, response.mimetype)
+                )
+            cache.tag_response(response, etag)
+        return response
+
+    return wrapper
+
+
+def count_conversations(db):
+    return db.query(Conversation).count()
+
+
+def find_conversation(db, username):
+    return db.query(Conversation).filter(Conversation.username == username).first()
+
+
+@v1.route("/message_volume")
+@cached_route
+async def message_volume():
+    """
+    Displays a Plotly graph of message volume per month, filterable by conversation id.
+
+    `format=data` returns the months and counts as arrays instead of a figure.
+    """
+    try:
+        response_format = parse_response_format(request.args.get("format"))
+    except ValueError as e:
+        return f"{e}", 400
+
+    conversation_id = request.args.get("id")  # Get id from query parameter
+    username_filter = await run_query(get_username_by_id, conversation_id)
+    if conversation_id and not username_filter:
+        return f"Conversation with id {conversation_id} not found.", 404
+
+    try:
+        months, message_counts = await run_query(query_monthly_volume, username_filter)
+        return jsonify(message_volume_payload(months, message_counts, response_format))
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/word_cloud")
+@cached_route
+async def word_cloud():
+    """
+    Analyzes messages for a given conversation id and date range to find the most frequent words.
+    """
+    conversation_id = request.args.get("id")
+    start_date_str = request.args.get("start_date")
+    end_date_str = request.args.get("end_date")
+    min_letters = min(request.args.get("letters", 0, type=int), 5)
+    username = await run_query(get_username_by_id, conversation_id)
+
+    if not username or not start_date_str or not end_date_str:
+        return (
+            "Please provide 'id', 'start_date', and 'end_date' parameters.",
+            400,
+        )
+
+    try:
+        top_words = await run_query(
+            query_top_words, username, start_date_str, end_date_str, min_letters
+        )
+        return jsonify({"top_words": top_words})
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/message_volume_by_period")
+@cached_route
+async def message_volume_by_period():
+    """
+    Calculates and displays the message volume by time period for a given conversation id and date range.
+
+    The conversation lookup and the bucketing query run concurrently.
+    """
+    conversation_id = request.args.get("id")
+    start_date_str = request.args.get("start_date")
+    end_date_str = request.args.get("end_date")
+    try:
+        timezone = resolve_timezone(request.args.get("timezone", "pst"))
+        boundaries = parse_period_boundaries(request.args.get("boundaries"))
+        response_format = parse_response_format(request.args.get("format"))
+    except ValueError as e:
+        return f"{e}", 400
+
+    if not conversation_id or not start_date_str or not end_date_str:
+        return (
+            "Please provide 'id', 'start_date', and 'end_date' parameters.",
+            400,
+        )
+    if not conversation_id.isdigit():
+        return f"Invalid conversation id {conversation_id}.", 400
+
+    try:
+        username_filter, volume_by_period = await asyncio.gather(
+            run_query(get_username_by_id, conversation_id),
+            run_query(
+                query_volume_by_period,
+                int(conversation_id),
+                start_date_str,
+                end_date_str,
+                timezone,
+                boundaries,
+            ),
+        )
+        if not username_filter:
+            return (
+                "Please provide 'id', 'start_date', and 'end_date' parameters.",
+                400,
+            )
+
+        return jsonify(
+            volume_by_period_payload(
+                volume_by_period, start_date_str, end_date_str, response_format
+            )
+        )
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/message_comparison")
+@cached_route
+async def message_comparison():
+    """
+    Displays a Plotly pie chart comparing the proportion of messages
+    sent by "self" and "unknown" within a conversation and date range.
+
+    `format=data` returns the labels and counts instead of a figure.
+    """
+    try:
+        response_format = parse_response_format(request.args.get("format"))
+    except ValueError as e:
+        return f"{e}", 400
+    conversation_id = request.args.get("id")
+    start_date_str = request.args.get("start_date")
+    end_date_str = request.args.get("end_date")
+    username_filter = await run_query(get_username_by_id, conversation_id)
+
+    if not username_filter:
+        return (
+            "Please provide 'id', 'start_date', and 'end_date' parameters.",
+            400,
+        )
+
+    try:
+        self_count, unknown_count = await run_query(
+            query_sender_counts, username_filter, start_date_str, end_date_str
+        )
+        if self_count + unknown_count == 0:
+            return "No messages found for the specified criteria.", 404
+
+        return jsonify(
+            message_comparison_payload(
+                self_count,
+                unknown_count,
+                start_date_str,
+                end_date_str,
+                response_format,
+            )
+        )
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/average_response_time")
+@cached_route
+async def average_response_time():
+    """
+    Calculates and displays the average response time for a given conversation and date.
+
+    The conversation lookup and the statistics query run concurrently.
+    """
+    conversation_id = request.args.get("id")
+    start_str = request.args.get("start_date")
+    end_str = request.args.get("end_date")
+    max_seconds = request.args.get(
+        "max_seconds", DEFAULT_MAX_RESPONSE_SECONDS, type=float
+    )
+    try:
+        percentiles = parse_percentiles(request.args.get("percentiles"))
+    except ValueError:
+        return "Invalid 'percentiles' parameter", 400
+
+    if not conversation_id or not start_str or not end_str:
+        return "Missing required query parameters", 400
+    if not conversation_id.isdigit():
+        return f"Invalid conversation id {conversation_id}.", 400
+
+    try:
+        username_filter, response_times = await asyncio.gather(
+            run_query(get_username_by_id, conversation_id),
+            run_query(
+                query_response_times,
+                int(conversation_id),
+                start_str,
+                end_str,
+                percentiles,
+                max_seconds,
+            ),
+        )
+        if not username_filter:
+            return "Missing required query parameters", 400
+
+        return jsonify(
+            {
+                "start_dt": start_str,
+                "end_dt": end_str,
+                "max_seconds": max_seconds,
+                **response_times,
+            }
+        )
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/summary")
+@cached_route
+async def summary():
+    """
+    Returns several conversation metrics for one date range in a single call.
+
+    Takes the same parameters as the Flask route. The hourly rollup query,
+    period buckets and response times are awaited together, so the request
+    costs roughly its slowest query rather than their sum.
+    """
+    conversation_id = request.args.get("id")
+    start_date_str = request.args.get("start_date")
+    end_date_str = request.args.get("end_date")
+    metrics = request.args.get("metrics", ",".join(SUMMARY_METRICS)).split(",")
+    max_seconds = request.args.get(
+        "max_seconds", DEFAULT_MAX_RESPONSE_SECONDS, type=float
+    )
+
+    if not conversation_id or not start_date_str or not end_date_str:
+        return (
+            "Please provide 'id', 'start_date', and 'end_date' parameters.",
+            400,
+        )
+    if not conversation_id.isdigit():
+        return f"Invalid conversation id {conversation_id}.", 400
+    unknown_metrics = [metric for metric in metrics if metric not in SUMMARY_METRICS]
+    if unknown_metrics:
+        return f"Unknown metrics: {', '.join(unknown_metrics)}.", 400
+    try:
+        percentiles = parse_percentiles(request.args.get("percentiles"))
+    except ValueError:
+        return "Invalid 'percentiles' parameter", 400
+    try:
+        timezone = resolve_timezone(request.args.get("timezone", "pst"))
+        boundaries = parse_period_boundaries(request.args.get("boundaries"))
+    except ValueError as e:
+        return f"{e}", 400
+
+    queries = {
+        "rollup_metrics": run_query(
+            query_summary_metrics,
+            int(conversation_id),
+            start_date_str,
+            end_date_str,
+            metrics,
+        )
+    }
+    if "message_volume_by_period" in metrics:
+        queries["message_volume_by_period"] = run_query(
+            query_volume_by_period,
+            int(conversation_id),
+            start_date_str,
+            end_date_str,
+            timezone,
+            boundaries,
+        )
+    if "average_response_time" in metrics:
+        queries["average_response_time"] = run_query(
+            query_response_times,
+            int(conversation_id),
+            start_date_str,
+            end_date_str,
+            percentiles,
+            max_seconds,
+        )
+
+    try:
+        answers = dict(zip(queries, await asyncio.gather(*queries.values())))
+        results = answers.pop("rollup_metrics")
+        if results is None:
+            return f"Conversation with id {conversation_id} not found.", 404
+
+        results.update(answers)
+
+        return jsonify(
+            {
+                "id": int(conversation_id),
+                "start_date": start_date_str,
+                "end_date": end_date_str,
+                "metrics": results,
+            }
+        )
+
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/search")
+@cached_route
+async def search():
+    """
+    Full-text search over messages, best matches first.
+
+    Takes the same parameters as the Flask route.
+    """
+    try:
+        search_args = parse_search_args(request.args)
+    except ValueError as e:
+        return f"{e}", 400
+
+    try:
+        results, next_cursor = await run_query(query_search, **search_args)
+        return jsonify(
+            {
+                "query": request.args.get("q"),
+                "results": results,
+                "next_cursor": next_cursor,
+            }
+        )
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/conversation_count")
+@cached_route
+async def conversation_count():
+    """
+    Returns the number of rows in the Conversation table.
+    """
+    try:
+        count = await run_query(count_conversations)
+        return jsonify({"conversation_count": count})
+    except Exception as e:
+        return f"An error occurred: {e}", 500
+
+
+@v1.route("/pool_stats")
+async def pool_status():
+    """
+    Returns this worker's connection pool occupancy and checkout-wait counters.
+    """
+    return jsonify(pool_stats(async_engine.sync_engine))
+
+
+@v1.route("/secret_message")
+async def secret_message():
+    """
+    Classified
+    """
+    secret = request.args.get("secret")
+    secret = secret.strip().lower() if secret else ""
+
+    if hash_string(secret) == hash_string(os.environ.get("SECRET")):
+        secret_path = "/etc/secrets/my_secret.key"
+        with open(secret_path, "r") as f:
+            secret_data = f.read()
+        return (
+            jsonify(
+                {
+                    "message": "Well done, did you brute force this, or was it actually the intended recepient? Either way, here's your secret message",
+                    "base64": secret_data,
+                }
+            ),
+            200,
+        )
+    else:
+        return jsonify({"message": "Access denied. Invalid secret."}), 403
+
+
+@v1.route("/username_exists")
+async def username_exists():
+    """
+    Checks if the given username exists in the Conversation table.
+    Returns {"exists": true/false, "secret": true/false}.
+    """
+    username = request.args.get("username")
+    if not username:
+        return jsonify({"error": "Missing 'username' query parameter."}), 400
+    try:
+        row = await run_query(find_conversation, username)
+        exists = row is not None
+        secret = exists and row.id in (16, 29)
+        return jsonify({"exists": exists, "secret": secret})
+    except Exception as e:
+        return f"An error occurred: {e}", 500
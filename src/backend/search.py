@@ -0,0 +1,206 @@
+# --- Message Search ---
+import base64
+import json
+import re
+from sqlalchemy import (
+    DateTime,
+    Float,
+    String,
+    and_,
+    cast,
+    column,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+)
+from backend.migrations import SEARCH_TEXT_CONFIG
+from backend.models import Message
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# A quoted phrase, or a bare word optionally ending in * for a prefix match
+SEARCH_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def parse_search_query(query):
+    """
+    Splits a search string into terms that must all match.
+
+    `"see you soon"` is a phrase and `part*` a prefix; anything else is a
+    plain word. Punctuation is dropped, so a term may expand to several words
+    that must then appear next to each other.
+
+    Returns:
+        list: (words, prefix) tuples, where `prefix` applies to the last word.
+
+    Raises:
+        ValueError: If the query contains no searchable words.
+    """
+    terms = []
+    for phrase, word in SEARCH_TERM_PATTERN.findall(query or ""):
+        words = tuple(WORD_PATTERN.findall((phrase or word).lower()))
+        if words:
+            terms.append((words, not phrase and word.endswith("*")))
+    if not terms:
+        raise ValueError("Please provide a search query 'q'.")
+    return terms
+
+
+def fts5_match(terms):
+    """Renders parsed terms as an SQLite FTS5 MATCH expression."""
+    return " ".join(
+        f'"{" ".join(words)}"' + ("*" if prefix else "") for words, prefix in terms
+    )
+
+
+def postgres_tsquery(terms):
+    """Renders parsed terms as a to_tsquery() expression."""
+    rendered = []
+    for words, prefix in terms:
+        lexemes = [f"'{word}'" for word in words]
+        if prefix:
+            lexemes[-1] += ":*"
+        rendered.append(" <-> ".join(lexemes))
+    return " & ".join(rendered)
+
+
+def encode_cursor(score, message_id):
+    """Packs the sort key of the last result into an opaque page cursor."""
+    payload = json.dumps([score, message_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Unpacks a cursor made by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        score, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(message_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid 'cursor' parameter.") from e
+
+
+def parse_search_args(args):
+    """
+    Reads the /search query parameters into keyword arguments of query_search.
+
+    Raises:
+        ValueError: If a parameter is missing or malformed.
+    """
+    conversation_id = args.get("id")
+    if conversation_id is not None and not conversation_id.isdigit():
+        raise ValueError(f"Invalid conversation id {conversation_id}.")
+    limit = args.get("limit", DEFAULT_SEARCH_LIMIT, type=int)
+    if limit is None or not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f"'limit' must be between 1 and {MAX_SEARCH_LIMIT}.")
+    cursor = args.get("cursor")
+    return {
+        "terms": parse_search_query(args.get("q")),
+        "conversation_id": int(conversation_id) if conversation_id else None,
+        "start_date_str": args.get("start_date"),
+        "end_date_str": args.get("end_date"),
+        "cursor": decode_cursor(cursor) if cursor else None,
+        "limit": limit,
+    }
+
+
+def query_search(
+    db,
+    terms,
+    conversation_id=None,
+    start_date_str=None,
+    end_date_str=None,
+    cursor=None,
+    limit=DEFAULT_SEARCH_LIMIT,
+):
+    """
+    Finds messages matching every term, best matches first.
+
+    Postgres matches the GIN-indexed message_tsv column and ranks with
+    ts_rank; SQLite matches the messages_fts table and ranks with bm25.
+    Results are ordered by (score desc, id desc), and `cursor` continues
+    after the last result of the previous page (keyset pagination), so pages
+    stay stable without OFFSET. Every match is still scored and sorted on
+    each page.
+
+    Returns:
+        tuple: Up to `limit` result dicts, and the cursor of the next page or
+        None on the last page.
+    """
+    messages = Message.__table__
+    if db.get_bind().dialect.name == "postgresql":
+        tsquery = func.to_tsquery(SEARCH_TEXT_CONFIG, postgres_tsquery(terms))
+        message_tsv = literal_column("messages.message_tsv")
+        # As double precision, so the score survives the JSON cursor exactly
+        score = cast(func.ts_rank(message_tsv, tsquery), Float)
+        matches = message_tsv.op("@@")(tsquery)
+        source = messages
+        # Typed in SQL like backend.routes.v1.as_timestamp, for asyncpg
+        bound = lambda value: cast(literal(value, String), DateTime)
+    else:
+        fts = table("messages_fts", column("rowid"))
+        # bm25 is lower for better matches
+        score = -func.bm25(literal_column("messages_fts"))
+        matches = literal_column("messages_fts").op("MATCH")(fts5_match(terms))
+        source = messages.join(fts, fts.c.rowid == messages.c.id)
+        bound = lambda value: value
+
+    filters = [matches]
+    if conversation_id is not None:
+        filters.append(messages.c.conversation_id == conversation_id)
+    if start_date_str:
+        filters.append(messages.c.timestamp_iso_dt >= bound(start_date_str))
+    if end_date_str:
+        filters.append(messages.c.timestamp_iso_dt <= bound(end_date_str))
+
+    ranked = (
+        select(
+            messages.c.id,
+            messages.c.conversation_id,
+            messages.c.sender,
+            messages.c.message,
+            messages.c.timestamp_iso_dt,
+            score.label("score"),
+        )
+        .select_from(source)
+        .where(*filters)
+        .subquery()
+    )
+    query = select(ranked)
+    if cursor is not None:
+        last_score, last_id = cursor
+        query = query.where(
+            or_(
+                ranked.c.score < last_score,
+                and_(ranked.c.score == last_score, ranked.c.id < last_id),
+            )
+        )
+    rows = db.execute(
+        query.order_by(ranked.c.score.desc(), ranked.c.id.desc()).limit(limit + 1)
+    ).all()
+
+    results = [
+        {
+            "id": row.id,
+            "conversation_id": row.conversation_id,
+            "sender": row.sender,
+            "message": row.message,
+            "timestamp": str(row.timestamp_iso_dt) if row.timestamp_iso_dt else None,
+            "score": row.score,
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.score, last.id)
+    return results, next_cursor
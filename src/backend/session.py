@@ -0,0 +1,81 @@
+# --- Request-Scoped Sessions ---
+import threading
+import time
+from flask import g
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from backend.config import SessionLocal, engine
+
+_checkout_stats = {
+    "checkouts": 0,
+    "checkout_timeouts": 0,
+    "checkout_wait_seconds_total": 0.0,
+    "checkout_wait_seconds_max": 0.0,
+}
+_checkout_stats_lock = threading.Lock()
+
+
+def record_checkout(wait_seconds, timed_out=False):
+    """Adds one connection checkout, and how long it waited, to the counters."""
+    with _checkout_stats_lock:
+        if timed_out:
+            _checkout_stats["checkout_timeouts"] += 1
+        else:
+            _checkout_stats["checkouts"] += 1
+        _checkout_stats["checkout_wait_seconds_total"] += wait_seconds
+        _checkout_stats["checkout_wait_seconds_max"] = max(
+            _checkout_stats["checkout_wait_seconds_max"], wait_seconds
+        )
+
+
+def get_db():
+    """
+    Returns the session of the current request, opening it on first use.
+
+    The connection is checked out right away so the time spent waiting on
+    the pool can be recorded. close_db returns it when the app context ends,
+    whichever way the view returned.
+    """
+    if "db" not in g:
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            db.connection()
+        except PoolTimeoutError:
+            record_checkout(time.perf_counter() - started, timed_out=True)
+            db.close()
+            raise
+        record_checkout(time.perf_counter() - started)
+        g.db = db
+    return g.db
+
+
+def close_db(exception=None):
+    """Closes the request's session, if one was opened."""
+    db = g.pop("db", None)
+    if db is not None:
+        db.close()
+
+
+def init_app(app):
+    """Registers the session teardown on a Flask app."""
+    app.teardown_appcontext(close_db)
+
+
+def pool_stats(pool_engine=engine):
+    """
+    Returns checkout-wait counters and the current occupancy of the pool of
+    `pool_engine`.
+
+    Counters are per worker process and cumulative since it started.
+    """
+    with _checkout_stats_lock:
+        stats = dict(_checkout_stats)
+    stats["checkout_wait_seconds_total"] = round(
+        stats["checkout_wait_seconds_total"], 6
+    )
+    stats["checkout_wait_seconds_max"] = round(stats["checkout_wait_seconds_max"], 6)
+    for name in ("size", "checkedout", "overflow", "checkedin"):
+        method = getattr(pool_engine.pool, name, None)
+        if method is not None:
+            stats[f"pool_{name}"] = method()
+    return stats
@@ -0,0 +1,81 @@
+# --- Word Cloud Tokenizer ---
+# Shared by the SQLite ingest and the Postgres refresh in backend.rollups so the
+# precomputed token counts match what word_cloud used to compute per request.
+
+# Common English stop words (can be expanded)
+STOP_WORDS = frozenset(
+    [
+        "the",
+        "a",
+        "an",
+        "is",
+        "it",
+        "in",
+        "on",
+        "at",
+        "for",
+        "with",
+        "and",
+        "or",
+        "but",
+        "not",
+        "i",
+        "you",
+        "he",
+        "she",
+        "it",
+        "we",
+        "they",
+        "my",
+        "your",
+        "his",
+        "her",
+        "its",
+        "our",
+        "their",
+        "to",
+        "of",
+        "from",
+        "by",
+        "as",
+        "so",
+        "that",
+        "this",
+        "these",
+        "those",
+        "be",
+        "am",
+        "are",
+        "was",
+        "were",
+        "been",
+        "have",
+        "has",
+        "had",
+        "do",
+        "does",
+        "did",
+        "can",
+        "could",
+        "will",
+        "would",
+        "get",
+        "like",
+    ]
+)
+
+
+def tokenize(message):
+    """
+    Splits a message into lowercase word-cloud tokens.
+
+    Stop words and tokens containing punctuation are dropped; the minimum
+    length filter (`letters`) is applied at query time.
+    """
+    if not message:
+        return []
+    return [
+        word
+        for word in message.lower().split()
+        if word not in STOP_WORDS and word.isalnum()
+    ]
@@ -0,0 +1,161 @@
+# instagram_analyzer/src/benchmarks/bench_ingest.py
+#
+# Run from src/:  python -m benchmarks.bench_ingest --conversations 20 --messages 5000
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic_export import generate_export
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _html_files(inbox):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(inbox)
+        for name in names
+        if name.endswith(".html")
+    )
+
+
+def bench_parse(inbox):
+    """Times parse_html_file over every file in the export."""
+    from parsing.parser import parse_html_file
+
+    start = time.perf_counter()
+    count = sum(len(parse_html_file(path)) for path in _html_files(inbox))
+    return count, time.perf_counter() - start, _peak_rss_mb()
+
+
+def bench_insert(inbox, database_filename):
+    """Times add_message_rows into a fresh database, rows parsed up front."""
+    os.environ["DATABASE_FILENAME"] = database_filename
+    from db.db_main import add_message_rows
+    from db.db_setup import initialize_database
+    from parsing.parser import parse_html_file
+
+    initialize_database()
+    rows = []
+    for path in _html_files(inbox):
+        for data in parse_html_file(path):
+            data["conversation_username"] = "benchmark"
+            data["conversation_id"] = 1
+            data["source_file"] = path
+            rows.append(data)
+
+    start = time.perf_counter()
+    count = add_message_rows(rows)
+    return count, time.perf_counter() - start, _peak_rss_mb()
+
+
+def bench_end_to_end(inbox, usernames_path, database_filename, workers):
+    """Times a full `main.py` run (drop, initialize, ingest) in a subprocess."""
+    env = dict(os.environ, DATABASE_FILENAME=database_filename)
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "main.py",
+            "--inbox",
+            inbox,
+            "--usernames",
+            usernames_path,
+            "--workers",
+            str(workers),
+        ],
+        input="3\n",
+        text=True,
+        cwd=SRC_DIR,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - start
+
+    import sqlite3
+
+    with sqlite3.connect(database_filename) as connection:
+        (count,) = connection.execute("SELECT COUNT(*) FROM messages").fetchone()
+    return count, elapsed, _peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+
+def _run_isolated(func, *args):
+    # A fresh interpreter per stage keeps each peak RSS reading independent
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark parsing, DB inserts and end-to-end ingestion."
+    )
+    arg_parser.add_argument("--conversations", type=int, default=10)
+    arg_parser.add_argument(
+        "--files", type=int, default=1, help="Files per conversation."
+    )
+    arg_parser.add_argument(
+        "--messages", type=int, default=5000, help="Messages per file."
+    )
+    arg_parser.add_argument("--workers", type=int, default=1, help="main.py --workers.")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--output", help="Also write the results to this JSON file."
+    )
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        inbox, usernames_path, generated = generate_export(
+            work_dir,
+            conversations=args.conversations,
+            files_per_conversation=args.files,
+            messages_per_file=args.messages,
+            seed=args.seed,
+        )
+        print(f"Generated {generated} synthetic messages in {work_dir}")
+
+        results = {
+            "parse_html_file": _run_isolated(bench_parse, inbox),
+            "add_message_rows": _run_isolated(
+                bench_insert, inbox, os.path.join(work_dir, "insert.db")
+            ),
+            "main.py": _run_isolated(
+                bench_end_to_end,
+                inbox,
+                usernames_path,
+                os.path.join(work_dir, "end_to_end.db"),
+                args.workers,
+            ),
+        }
+
+    print(
+        f"{'stage':<18}{'messages':>10}{'seconds':>10}{'msgs/sec':>12}{'peak MB':>10}"
+    )
+    report = {}
+    for stage, (count, seconds, peak_mb) in results.items():
+        rate = count / seconds if seconds else 0.0
+        print(f"{stage:<18}{count:>10}{seconds:>10.2f}{rate:>12.0f}{peak_mb:>10.1f}")
+        report[stage] = {
+            "messages": count,
+            "seconds": round(seconds, 4),
+            "messages_per_second": round(rate, 1),
+            "peak_rss_mb": round(peak_mb, 1),
+        }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"params": vars(args), "results": report}, file, indent=2)
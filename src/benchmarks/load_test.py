@@ -0,0 +1,465 @@
+# instagram_analyzer/src/benchmarks/load_test.py
+#
+# Run from src/ against a disposable Postgres (never Supabase):
+#   python -m benchmarks.load_test --database-url postgresql://localhost/loadtest \
+#       --seed --conversations 20 --messages 20000 --concurrency 16 --duration 30
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.synthetic_export import DEFAULT_MIX, LIKE_RATE, WORDS, export_timestamp
+
+SEED_BATCH_SIZE = 10000
+FIRST_TIMESTAMP = datetime(2024, 1, 1)
+# Minutes between consecutive messages: bursts of chat, then quiet gaps
+GAP_MINUTES = (0, 0, 1, 1, 2, 5, 15, 60, 240, 720)
+
+# Every v1 route, for --mix
+ROUTES = (
+    "message_volume",
+    "word_cloud",
+    "message_volume_by_period",
+    "message_comparison",
+    "average_response_time",
+    "summary",
+    "search",
+    "conversation_count",
+    "username_exists",
+    "pool_stats",
+    "secret_message",
+)
+# Relative weight of each route in the default request mix, which leaves
+# out secret_message as it is not dashboard traffic
+DEFAULT_ROUTE_MIX = {
+    "message_volume": 2,
+    "word_cloud": 2,
+    "message_volume_by_period": 2,
+    "message_comparison": 2,
+    "average_response_time": 2,
+    "summary": 4,
+    "search": 2,
+    "conversation_count": 1,
+    "username_exists": 1,
+    "pool_stats": 1,
+}
+
+
+# --- Seeding ---
+
+
+def synthetic_messages(rng, conversation_id, username, count):
+    """Yields `count` message rows for one conversation, oldest first."""
+    kinds, weights = zip(*DEFAULT_MIX.items())
+    timestamp = FIRST_TIMESTAMP + timedelta(minutes=rng.randrange(60 * 24 * 30))
+    sender = "self"
+    for _ in range(count):
+        timestamp += timedelta(minutes=rng.choice(GAP_MINUTES))
+        if rng.random() < 0.6:
+            sender = "unknown" if sender == "self" else "self"
+        kind = rng.choices(kinds, weights)[0]
+        liked = rng.random() < LIKE_RATE
+        yield {
+            "conversation_id": conversation_id,
+            "conversation_username": username,
+            "sender": sender,
+            "message": " ".join(rng.choices(WORDS, k=rng.randint(1, 12))),
+            "timestamp": export_timestamp(timestamp),
+            "timestamp_iso_dt": timestamp,
+            "story_reply": kind == "story_reply",
+            "liked": liked,
+            "timestamp_liked": timestamp + timedelta(minutes=5) if liked else None,
+            "attachment": kind == "attachment",
+            "attachment_link": None,
+            "reference_account": None,
+            "audio": kind == "audio",
+            "photo": kind == "photo",
+            "video": kind == "video",
+            "source_file": f"{username}/message_1.html",
+        }
+
+
+def seed_database(engine, conversations, messages, seed=0, reseed=False):
+    """
+    Fills an empty database with synthetic conversations and messages.
+
+    The schema comes from backend.migrations, the rollups from
+    backend.rollups, so every v1 route has data to serve.
+
+    Returns:
+        list: The seeded conversations as (id, username) pairs.
+
+    Raises:
+        ValueError: If the database already has messages and `reseed` is False.
+    """
+    from sqlalchemy import func, insert, select
+    from backend.migrations import migrate
+    from backend.models import Conversation, Message, MessageCountHourly
+    from backend.models import MessageTokenCount
+
+    migrate(engine)
+    with engine.begin() as connection:
+        existing = connection.execute(
+            select(func.count()).select_from(Message)
+        ).scalar()
+        if existing and not reseed:
+            raise ValueError(
+                f"The database already holds {existing} messages; "
+                "pass --reseed to replace them."
+            )
+        for model in (Message, MessageCountHourly, MessageTokenCount, Conversation):
+            connection.execute(model.__table__.delete())
+
+    rng = random.Random(seed)
+    seeded = [(index, f"loadtest_user{index}") for index in range(1, conversations + 1)]
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Conversation),
+            [{"id": id_, "username": name, "name": name} for id_, name in seeded],
+        )
+    for conversation_id, username in seeded:
+        batch = []
+        for row in synthetic_messages(rng, conversation_id, username, messages):
+            batch.append(row)
+            if len(batch) >= SEED_BATCH_SIZE:
+                with engine.begin() as connection:
+                    connection.execute(insert(Message), batch)
+                batch = []
+        if batch:
+            with engine.begin() as connection:
+                connection.execute(insert(Message), batch)
+        print(f"Seeded {messages} messages for {username}")
+
+    from backend.rollups import refresh_hourly_counts, refresh_token_counts
+
+    refresh_hourly_counts()
+    refresh_token_counts()
+    return seeded
+
+
+def seeded_conversations(engine):
+    """Returns the (id, username) pairs of a database seeded earlier."""
+    from sqlalchemy import select
+    from backend.models import Conversation
+
+    with engine.connect() as connection:
+        return [
+            tuple(row)
+            for row in connection.execute(
+                select(Conversation.id, Conversation.username).order_by(Conversation.id)
+            )
+        ]
+
+
+# --- Request mix ---
+
+
+def _date_range(rng):
+    start = FIRST_TIMESTAMP + timedelta(days=rng.randrange(365))
+    end = start + timedelta(days=rng.choice((7, 30, 90, 365)))
+    return f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}"
+
+
+def build_request(route, rng, conversations):
+    """Returns the path and query string of one request to `route`."""
+    conversation_id, username = rng.choice(conversations)
+    start_date, end_date = _date_range(rng)
+    ranged = {"id": conversation_id, "start_date": start_date, "end_date": end_date}
+    params = {
+        "message_volume": lambda: (
+            {"id": conversation_id, "format": "data"}
+            if rng.random() < 0.8
+            else {"format": "data"}
+        ),
+        "word_cloud": lambda: dict(ranged, letters=rng.choice((0, 3, 5))),
+        "message_volume_by_period": lambda: dict(
+            ranged, format="data", timezone=rng.choice(("pst", "est", "UTC"))
+        ),
+        "message_comparison": lambda: dict(ranged, format="data"),
+        "average_response_time": lambda: dict(ranged, percentiles="50,90,99"),
+        "summary": lambda: ranged,
+        "search": lambda: {
+            "q": " ".join(rng.sample(WORDS, rng.randint(1, 2))),
+            "id": conversation_id,
+        },
+        "conversation_count": dict,
+        "username_exists": lambda: {"username": username},
+        "pool_stats": dict,
+        "secret_message": lambda: {"secret": "load-test"},
+    }[route]()
+    query = urlencode(params)
+    return f"/v1/{route}" + (f"?{query}" if query else "")
+
+
+def parse_mix(value):
+    """
+    Parses a request mix such as "summary=4,search=1".
+
+    Raises:
+        ValueError: If a route is unknown or a weight is not a positive integer.
+    """
+    if not value:
+        return dict(DEFAULT_ROUTE_MIX)
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route {route}.")
+        mix[route] = int(weight or 1)
+        if mix[route] <= 0:
+            raise ValueError(f"Weight of {route} must be positive.")
+    return mix
+
+
+# --- Load generation ---
+
+
+class Results:
+    """Latencies and status codes per route, shared by the client threads."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+
+
+def percentile(sorted_values, percent):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+
+
+def _client(base_url, mix, conversations, seed, deadline, warmup_until, results):
+    """One simulated dashboard: sends requests back to back until `deadline`."""
+    rng = random.Random(seed)
+    routes, weights = zip(*mix.items())
+    target = urlsplit(base_url)
+    connection = None
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        path = build_request(route, rng, conversations)
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection(
+                    target.hostname, target.port, timeout=60
+                )
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+            if response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            status = "error"
+            if connection is not None:
+                connection.close()
+            connection = None
+        if started >= warmup_until:
+            results.record(route, time.perf_counter() - started, status)
+    if connection is not None:
+        connection.close()
+
+
+def run_load(base_url, mix, conversations, concurrency, duration, warmup=0, seed=0):
+    """
+    Sends the request mix from `concurrency` threads for `warmup + duration` seconds.
+
+    Requests finished during the warmup are not recorded.
+
+    Returns:
+        tuple: The Results, and the measured wall-clock seconds.
+    """
+    results = Results()
+    started = time.perf_counter()
+    warmup_until = started + warmup
+    deadline = warmup_until + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            args=(
+                base_url,
+                mix,
+                conversations,
+                seed + index,
+                deadline,
+                warmup_until,
+                results,
+            ),
+            daemon=True,
+        )
+        for index in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - warmup_until
+
+
+def summarize(results, seconds):
+    """Throughput, latency percentiles (ms) and status counts per route."""
+    report = {}
+    routes = sorted(results.latencies)
+    for route in routes + ["all"]:
+        if route == "all":
+            latencies = sorted(
+                value for values in results.latencies.values() for value in values
+            )
+            statuses = sum(results.statuses.values(), Counter())
+        else:
+            latencies = sorted(results.latencies[route])
+            statuses = results.statuses[route]
+        if not latencies:
+            continue
+        report[route] = {
+            "requests": len(latencies),
+            "requests_per_second": round(len(latencies) / seconds, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "statuses": {str(status): count for status, count in statuses.items()},
+        }
+    return report
+
+
+def print_report(report):
+    print(
+        f"{'route':<26}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+        f"{'p99 ms':>9}  statuses"
+    )
+    for route, row in report.items():
+        statuses = " ".join(
+            f"{status}:{count}" for status, count in sorted(row["statuses"].items())
+        )
+        print(
+            f"{route:<26}{row['requests']:>9}{row['requests_per_second']:>9.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+            f"  {statuses}"
+        )
+
+
+def serve_in_process():
+    """
+    Starts backend.main's Flask app on a free local port, one thread per request.
+
+    Returns:
+        tuple: The server and its base URL.
+    """
+    from werkzeug.serving import make_server
+    from backend.main import app
+
+    # The per-request access log would drown out the report
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Load-test the v1 API against a local stand-in database."
+    )
+    arg_parser.add_argument(
+        "--database-url",
+        required=True,
+        help="a disposable Postgres database; the v1 queries need Postgres",
+    )
+    arg_parser.add_argument(
+        "--url",
+        help="base URL of an already running server (e.g. gunicorn) using "
+        "--database-url; by default the Flask app is served in-process",
+    )
+    arg_parser.add_argument(
+        "--seed", action="store_true", help="fill an empty database first"
+    )
+    arg_parser.add_argument(
+        "--reseed", action="store_true", help="replace existing data when seeding"
+    )
+    arg_parser.add_argument("--conversations", type=int, default=10)
+    arg_parser.add_argument(
+        "--messages", type=int, default=10000, help="Messages per conversation."
+    )
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--duration", type=float, default=30, help="Seconds.")
+    arg_parser.add_argument(
+        "--warmup", type=float, default=5, help="Seconds not recorded."
+    )
+    arg_parser.add_argument(
+        "--mix",
+        help='Route weights, e.g. "summary=4,search=1" (default: DEFAULT_ROUTE_MIX).',
+    )
+    arg_parser.add_argument("--random-seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--output", help="Also write the results to this JSON file."
+    )
+    args = arg_parser.parse_args()
+
+    if not args.database_url.startswith("postgresql"):
+        sys.exit(
+            "--database-url must be a Postgres URL; the v1 routes use Postgres SQL."
+        )
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        sys.exit(f"Invalid --mix: {e}")
+
+    # backend.config reads the connection string when first imported
+    os.environ["SUPABASE_CONNECTION_STRING"] = args.database_url
+    from backend.config import engine
+
+    if args.seed or args.reseed:
+        try:
+            conversations = seed_database(
+                engine, args.conversations, args.messages, args.random_seed, args.reseed
+            )
+        except ValueError as e:
+            sys.exit(f"{e}")
+    else:
+        conversations = seeded_conversations(engine)
+    if not conversations:
+        sys.exit("The database has no conversations; run with --seed first.")
+
+    base_url = args.url
+    if base_url is None:
+        server, base_url = serve_in_process()
+    print(
+        f"Sending {args.concurrency} concurrent clients to {base_url} for "
+        f"{args.warmup:g}s warmup + {args.duration:g}s"
+    )
+    results, seconds = run_load(
+        base_url,
+        mix,
+        conversations,
+        args.concurrency,
+        args.duration,
+        args.warmup,
+        args.random_seed,
+    )
+    report = summarize(results, seconds)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"params": vars(args), "results": report}, file, indent=2)
@@ -0,0 +1,190 @@
+# instagram_analyzer/src/benchmarks/synthetic_export.py
+
+import argparse
+import html
+import os
+import random
+from datetime import datetime, timedelta
+
+SELF_NAME = "Aryan Thakur"
+SELF_ACCOUNT = "aryanthakxr"
+
+# Relative weight of each message kind in a generated file
+DEFAULT_MIX = {
+    "text": 70,
+    "story_reply": 5,
+    "shared_story": 4,
+    "audio": 3,
+    "video": 3,
+    "photo": 5,
+    "attachment": 2,
+    "reel": 5,
+    "liked_message": 3,
+}
+LIKE_RATE = 0.1
+
+WORDS = (
+    "hey what are you doing tonight lol haha yeah sure bro ok okay send me that "
+    "reel again tomorrow class exam food party late sleep call later nice good"
+).split()
+
+MESSAGE_TEMPLATE = (
+    '<div class="pam _3-95 _2ph- _a6-g uiBoxWhite noborder">'
+    '<div class="_3-95 _2pim _a6-h _a6-i">{sender}</div>'
+    '<div class="_3-95 _a6-p"><div><div></div><div>{body}</div>'
+    "<div>{extra}</div><div></div>{reaction}</div></div>"
+    '<div class="_3-94 _a6-o">{timestamp}</div>'
+    "</div>"
+)
+FILE_TEMPLATE = (
+    '<html><head><meta charset="utf-8" /><title>{title}</title></head>'
+    '<body class="_5vb_ _2yq _a7o5"><div class="clearfix _ikh"><div class="_4bl9">'
+    '<div class="_li"><div class="_a705"><div class="_a706" role="main">'
+    "{messages}</div></div></div></div></div></body></html>"
+)
+
+
+def export_timestamp(dt):
+    """Formats a datetime the way the export does, e.g. "Apr 26, 2025 10:15 pm"."""
+    return (
+        f"{dt:%b %d, %Y} {dt.hour % 12 or 12}:{dt:%M} {'am' if dt.hour < 12 else 'pm'}"
+    )
+
+
+def _message_html(rng, kind, sender, other_account, dt):
+    body = html.escape(" ".join(rng.choices(WORDS, k=rng.randint(1, 12))))
+    extra = ""
+    if kind == "story_reply":
+        extra = f'<a href="https://www.instagram.com/stories/{SELF_ACCOUNT}/{rng.randrange(10**18)}">story</a>'
+    elif kind == "shared_story":
+        extra = f'<a href="https://www.instagram.com/stories/{other_account}/{rng.randrange(10**18)}/">story</a>'
+    elif kind == "audio":
+        extra = '<audio src="audio/1.mp4" controls="1"></audio>'
+    elif kind == "video":
+        extra = '<video src="videos/1.mp4" controls="1"></video>'
+    elif kind == "photo":
+        extra = '<img src="photos/1.jpg" class="_a6_o _3-96" />'
+    elif kind == "attachment":
+        body = f"{html.escape(sender)} sent an attachment."
+    elif kind == "reel":
+        extra = f'<a href="https://www.instagram.com/reel/{rng.randrange(10**12):x}/">reel</a>'
+    elif kind == "liked_message":
+        body = "Liked a message"
+
+    reaction = ""
+    if rng.random() < LIKE_RATE:
+        reaction = (
+            '<div><ul class="_a6-q"><li><span>❤<span>'
+            f"({export_timestamp(dt + timedelta(minutes=rng.randint(1, 90)))})"
+            "</span></span></li></ul></div>"
+        )
+
+    return MESSAGE_TEMPLATE.format(
+        sender=html.escape(sender),
+        body=body,
+        extra=extra,
+        reaction=reaction,
+        timestamp=export_timestamp(dt),
+    )
+
+
+def generate_export(
+    output_dir,
+    conversations=10,
+    files_per_conversation=1,
+    messages_per_file=10000,
+    mix=None,
+    seed=0,
+):
+    """
+    Writes a synthetic Instagram inbox with the same markup as a real export.
+
+    Args:
+        output_dir (str): Directory that receives `inbox/` and `usernames.txt`.
+        conversations (int): Number of conversation directories.
+        files_per_conversation (int): message_N.html files per conversation.
+        messages_per_file (int): uiBoxWhite message divs per file.
+        mix (dict): Relative weight per message kind, defaults to DEFAULT_MIX.
+        seed (int): Seed for reproducible output.
+
+    Returns:
+        tuple: (inbox path, usernames.txt path, total number of message divs).
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+
+    inbox = os.path.join(output_dir, "inbox")
+    usernames_path = os.path.join(output_dir, "usernames.txt")
+    os.makedirs(inbox, exist_ok=True)
+    total = 0
+
+    with open(usernames_path, "w") as usernames_file:
+        for index in range(conversations):
+            prefix = f"synthetic{index}"
+            account = f"synthetic.user{index}"
+            other_name = f"Synthetic User {index}"
+            usernames_file.write(f"{prefix}={account}\n")
+
+            subdir = os.path.join(inbox, f"{prefix}_{rng.randrange(10**15, 10**16)}")
+            os.makedirs(subdir, exist_ok=True)
+
+            # Exports list the newest messages first, message_1.html being the latest
+            dt = datetime(2025, 4, 26, 23, 59)
+            for file_number in range(1, files_per_conversation + 1):
+                parts = []
+                for _ in range(messages_per_file):
+                    sender = SELF_NAME if rng.random() < 0.5 else other_name
+                    kind = rng.choices(kinds, weights)[0]
+                    parts.append(_message_html(rng, kind, sender, account, dt))
+                    dt -= timedelta(minutes=rng.choice((0, 0, 1, 2, 5, 30, 240)))
+                with open(
+                    os.path.join(subdir, f"message_{file_number}.html"),
+                    "w",
+                    encoding="utf-8",
+                ) as file:
+                    file.write(
+                        FILE_TEMPLATE.format(title=other_name, messages="".join(parts))
+                    )
+                total += messages_per_file
+
+    return inbox, usernames_path, total
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Generate a synthetic Instagram inbox export."
+    )
+    arg_parser.add_argument("output_dir")
+    arg_parser.add_argument("--conversations", type=int, default=10)
+    arg_parser.add_argument(
+        "--files", type=int, default=1, help="Files per conversation."
+    )
+    arg_parser.add_argument(
+        "--messages", type=int, default=10000, help="Messages per file."
+    )
+    arg_parser.add_argument(
+        "--mix",
+        default=None,
+        help="Comma-separated kind=weight pairs, e.g. text=80,photo=10,audio=10.",
+    )
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    mix = None
+    if args.mix:
+        mix = {
+            kind: float(weight)
+            for kind, weight in (pair.split("=") for pair in args.mix.split(","))
+        }
+
+    inbox, usernames_path, total = generate_export(
+        args.output_dir,
+        conversations=args.conversations,
+        files_per_conversation=args.files,
+        messages_per_file=args.messages,
+        mix=mix,
+        seed=args.seed,
+    )
+    print(f"✅ Wrote {total} messages to {inbox} (usernames in {usernames_path}).")
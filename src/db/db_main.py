@@ -1,7 +1,7 @@
 # instagram_analyzer/src/.py
 
-from datetime import datetime
 import os
+from collections import Counter
 from sqlalchemy import (
     create_engine,
     text,
@@ -13,9 +13,13 @@ from sqlalchemy import (
     select,
     update,
     bindparam,
+    event,
 )
 from sqlalchemy.exc import SQLAlchemyError
 
+from backend.tokens import tokenize
+from parsing.timestamps import to_iso
+
 # --- Configuration ---
 # The database file will be created in the root of your project directory
 # because we mounted '.' on the host to '/app' in the container, and our
@@ -35,11 +39,48 @@ your_table = Table(
     metadata,
     Column("id", Integer, primary_key=True),  # Adjust type if PK is not Integer
     Column("timestamp", String),
-    Column("timestamp_iso", String),
+    Column("timestamp_iso_dt", String),
     # Add other columns if you want to reflect the whole table, or use autoload_with=engine
 )
 
 
+MESSAGE_INSERT_QUERY = text(
+    """
+    INSERT INTO messages (
+    conversation_id, conversation_username, sender, message, timestamp, timestamp_iso_dt, story_reply, liked, timestamp_liked,
+        attachment, attachment_link, reference_account, audio, video, photo, source_file
+    ) VALUES (
+        :conversation_id, :conversation_username, :sender, :message, :timestamp, :timestamp_iso, :story_reply, :liked, :timestamp_liked,
+        :attachment, :attachment_link, :reference_account, :audio, :video, :photo, :source_file
+    )
+"""
+)
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _set_fast_load_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+def enable_fast_load():
+    """
+    Switches the engine into fast-load mode for the initial bulk ingest.
+
+    Every new connection gets journal_mode=WAL and synchronous=OFF, trading
+    crash durability for write throughput. Only use this while (re)building
+    the database from an export that can simply be loaded again.
+    """
+    if not event.contains(engine, "connect", _set_fast_load_pragmas):
+        event.listen(engine, "connect", _set_fast_load_pragmas)
+    # Drop pooled connections so the pragmas apply to the next checkout
+    engine.dispose()
+
+
 def add_message_row(data):
     """
     Adds a row to the 'messages' table in the SQLite database.
@@ -47,130 +88,274 @@ def add_message_row(data):
     Args:
         data (dict): A dictionary containing the column names as keys and their respective values.
     """
-    insert_query = text(
-        """
-        INSERT INTO messages (
-        conversation_username, sender, message, timestamp, story_reply, liked, timestamp_liked,
-            attachment, attachment_link, reference_account, audio, video, photo
-        ) VALUES (
-            :conversation_username, :sender, :message, :timestamp, :story_reply, :liked, :timestamp_liked,
-            :attachment, :attachment_link, :reference_account, :audio, :video, :photo
-        )
-    """
-    )
     try:
         with engine.begin() as connection:  # engine.begin() handles transaction + commit
-            connection.execute(insert_query, data)
+            connection.execute(MESSAGE_INSERT_QUERY, data)
     except SQLAlchemyError as e:
         print(f"An error occurred: {e}")
         exit(-1)
 
 
+def add_message_rows(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Adds many rows to the 'messages' table, one transaction per batch.
+
+    Args:
+        rows (iterable): Dictionaries shaped like the ones accepted by add_message_row.
+        batch_size (int): Number of rows sent per executemany call and commit.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    inserted = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                with engine.begin() as connection:
+                    connection.execute(MESSAGE_INSERT_QUERY, batch)
+                inserted += len(batch)
+                batch = []
+        if batch:
+            with engine.begin() as connection:
+                connection.execute(MESSAGE_INSERT_QUERY, batch)
+            inserted += len(batch)
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
+    return inserted
+
+
 def add_conversation_row(data):
     """
     Adds a row to the 'conversations' table in the SQLite database.
 
+    New conversations get the next integer id; an existing username keeps
+    the id it already has.
+
     Args:
         data (dict): A dictionary containing the column names as keys and their respective values.
+
+    Returns:
+        int: The conversation's id, referenced by messages.conversation_id.
     """
     insert_query = text(
         """
                     INSERT INTO conversations (
-                        username, name
+                        id, username, name
                     ) VALUES (
-                        :username, :name
+                        (SELECT COALESCE(MAX(id), 0) + 1 FROM conversations), :username, :name
                     )
+                    ON CONFLICT(username) DO NOTHING
                     """
     )
+    select_query = text("SELECT id FROM conversations WHERE username = :username")
     try:
         with engine.begin() as connection:  # engine.begin() handles transaction + commit
             connection.execute(insert_query, data)
+            return connection.execute(select_query, data).scalar()
     except SQLAlchemyError as e:
         print(f"An error occurred: {e}")
         exit(-1)
 
 
-def generate_timestamp_iso():
-    print("Generating ISO timestamps...")
-    rows_to_process = []
-
-    # Phase 1: Read data that needs conversion
-    # We use engine.connect() here as it's a read-only operation for now.
-    # The actual update will be in an engine.begin() block
-
-    with engine.connect() as connection:
-        # Select rows where the new timestamp column is NULL (to avoid re-processing)
-        # and the old timestamp column is NOT NULL
-        stmt_select = select(
-            your_table.c["id"],  # Use .c to access columns of a Table object
-            your_table.c["timestamp"],
-        ).where(
-            your_table.c["timestamp_iso"].is_(None),
-            your_table.c["timestamp"].is_not(None),
-        )
+def refresh_hourly_counts(conversation_usernames):
+    """
+    Rebuilds the 'message_counts_hourly' rollup for the given conversations.
 
-        result = connection.execute(stmt_select)
-        rows_to_process = result.fetchall()  # Fetches all rows as tuples
+    Counts are recomputed from 'messages' with one INSERT ... SELECT per
+    conversation, which also accounts for rows replaced by a re-ingest.
 
-    if not rows_to_process:
-        print("No timestamps found to convert or all are already converted.")
-        return
+    Args:
+        conversation_usernames (iterable): Usernames whose messages changed.
+    """
+    delete_query = text(
+        "DELETE FROM message_counts_hourly WHERE conversation_username = :username"
+    )
+    insert_query = text(
+        """
+        INSERT INTO message_counts_hourly (conversation_username, hour, sender, message_count)
+        SELECT conversation_username, strftime('%Y-%m-%d %H:00:00', timestamp_iso_dt), sender, COUNT(*)
+        FROM messages
+        WHERE conversation_username = :username
+            AND timestamp_iso_dt IS NOT NULL
+            AND sender IS NOT NULL
+        GROUP BY 1, 2, 3
+        """
+    )
+    try:
+        with engine.begin() as connection:
+            for username in conversation_usernames:
+                connection.execute(delete_query, {"username": username})
+                connection.execute(insert_query, {"username": username})
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
 
-    updates_for_db = []
-    print(f"Found {len(rows_to_process)} rows to process.")
 
-    for pk_value, old_ts_str in rows_to_process:
-        if not old_ts_str:  # Should be caught by IS NOT NULL, but good for safety
-            print(
-                f"Skipping PK {pk_value} due to empty old timestamp (should not happen with query)."
-            )
-            continue
-
-        try:
-            # Parse the old timestamp string
-            dt_object = datetime.strptime(old_ts_str, "%b %d, %Y %I:%M %p")
-            # Format it to ISO 8601 ("YYYY-MM-DD HH:MM:SS")
-            iso_ts_str = dt_object.strftime("%Y-%m-%d %H:%M:%S")
-
-            # Prepare data for executemany-style update
-            # The keys here ('_pk', '_new_ts') will be used with bindparam
-            updates_for_db.append({"_pk": pk_value, "_new_ts": iso_ts_str})
-
-        except ValueError as e:
-            print(f"Error parsing timestamp '{old_ts_str}' for PK {pk_value}: {e}")
-        except TypeError as e:
-            print(
-                f"TypeError for timestamp '{old_ts_str}' (possibly None) for PK {pk_value}: {e}"
-            )
+def refresh_token_counts(conversation_usernames):
+    """
+    Rebuilds the word-cloud token counts for the given conversations.
 
-    if not updates_for_db:
-        print("No valid timestamps could be parsed for update.")
-        return
+    Uses the same eligibility rules and tokenizer as the backend's
+    word_cloud route, counting tokens per conversation and day.
 
-    # Phase 2: Batch update the database using your preferred style
+    Args:
+        conversation_usernames (iterable): Usernames whose messages changed.
+    """
+    delete_query = text(
+        "DELETE FROM message_token_counts WHERE conversation_username = :username"
+    )
+    # Reactions, story replies, attachments and media are excluded
+    select_query = text(
+        """
+        SELECT date(timestamp_iso_dt), message
+        FROM messages
+        WHERE conversation_username = :username
+            AND timestamp_iso_dt IS NOT NULL
+            AND message NOT GLOB 'Reacted * to your message'
+            AND story_reply = 0
+            AND (attachment IS NULL OR attachment IS NOT 1)
+            AND (audio IS NULL OR audio = 0)
+            AND (photo IS NULL OR photo = 0)
+            AND (video IS NULL OR video = 0)
+        """
+    )
+    insert_query = text(
+        """
+        INSERT INTO message_token_counts (conversation_username, day, token, token_count)
+        VALUES (:username, :day, :token, :token_count)
+        """
+    )
     try:
-        # Define the update statement using SQLAlchemy Core and bindparams
-        # This allows SQLAlchemy to perform an "executemany" efficiently.
-        stmt_update = (
-            update(your_table)
-            .where(
-                your_table.c["id"] == bindparam("_pk")
-            )  # Matches key in 'updates_for_db' dict
-            .values(
-                {"timestamp_iso": bindparam("_new_ts")}
-            )  # Matches key in 'updates_for_db' dict
-        )
-        # For rowid: .where(column('rowid') == bindparam('_pk'))
+        with engine.begin() as connection:
+            for username in conversation_usernames:
+                connection.execute(delete_query, {"username": username})
+                counts = Counter()
+                for day, message in connection.execute(
+                    select_query, {"username": username}
+                ):
+                    for token in tokenize(message):
+                        counts[(day, token)] += 1
+                if counts:
+                    connection.execute(
+                        insert_query,
+                        [
+                            {
+                                "username": username,
+                                "day": day,
+                                "token": token,
+                                "token_count": count,
+                            }
+                            for (day, token), count in counts.items()
+                        ],
+                    )
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
+
+
+def bump_data_generation():
+    """
+    Increments the data generation after an ingest changed any rows.
+
+    Response caches key their entries on this counter, so bumping it
+    invalidates every cached analytics response at once.
+
+    Returns:
+        int: The new generation.
+    """
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                text(
+                    """
+                    UPDATE data_generation
+                    SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = 1
+                    """
+                )
+            )
+            return connection.execute(
+                text("SELECT generation FROM data_generation WHERE id = 1")
+            ).scalar()
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
+
 
-        with engine.begin() as connection:  # Handles transaction + commit/rollback
-            connection.execute(stmt_update, updates_for_db)
-        print(
-            f"Successfully updated {len(updates_for_db)} rows with standardized timestamps."
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def generate_timestamp_iso(chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Backfills timestamp_iso_dt for rows ingested without it.
+
+    New rows get their ISO timestamp at parse time, so this only matters for
+    older databases. Rows are walked in primary-key order, one chunk at a time
+    (keyset pagination), so memory use is bounded by `chunk_size`.
+    """
+    print("Generating ISO timestamps...")
+
+    # Select rows where the new timestamp column is NULL (to avoid re-processing)
+    # and the old timestamp column is NOT NULL, continuing after the last seen id
+    stmt_select = (
+        select(your_table.c["id"], your_table.c["timestamp"])
+        .where(
+            your_table.c["id"] > bindparam("_last_pk"),
+            your_table.c["timestamp_iso_dt"].is_(None),
+            your_table.c["timestamp"].is_not(None),
         )
+        .order_by(your_table.c["id"])
+        .limit(chunk_size)
+    )
+    stmt_update = (
+        update(your_table)
+        .where(your_table.c["id"] == bindparam("_pk"))
+        .values({"timestamp_iso_dt": bindparam("_new_ts")})
+    )
+
+    last_pk = 0
+    processed = 0
+    updated = 0
+
+    try:
+        while True:
+            with engine.begin() as connection:  # Handles transaction + commit/rollback
+                rows = connection.execute(stmt_select, {"_last_pk": last_pk}).fetchall()
+                if not rows:
+                    break
+
+                updates_for_db = []
+                for pk_value, old_ts_str in rows:
+                    iso_ts_str = to_iso(old_ts_str)
+                    if iso_ts_str is None:
+                        print(
+                            f"Error parsing timestamp '{old_ts_str}' for PK {pk_value}"
+                        )
+                        continue
+                    updates_for_db.append({"_pk": pk_value, "_new_ts": iso_ts_str})
+
+                if updates_for_db:
+                    connection.execute(stmt_update, updates_for_db)
+
+            last_pk = rows[-1][0]
+            processed += len(rows)
+            updated += len(updates_for_db)
 
     except Exception as e:  # Catch generic SQLAlchemy errors or others
         print(f"An error occurred during database update: {e}")
         # The 'engine.begin()' context manager will automatically roll back on exception.
+        return
+
+    if not processed:
+        print("No timestamps found to convert or all are already converted.")
+        return
+
+    print(
+        f"Successfully updated {updated} of {processed} rows with standardized timestamps."
+    )
 
 
 if __name__ == "__main__":
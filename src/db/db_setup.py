@@ -1,7 +1,10 @@
 # instagram_analyzer/src/.py
 
 import os
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
+
+from backend.migrations import migrate
+from backend.models import Base
 
 # --- Configuration ---
 # The database file will be created in the root of your project directory
@@ -18,22 +21,11 @@ engine = create_engine(DATABASE_URL, echo=False)
 
 
 def drop_tables():
-    """Drops the 'messages' and 'conversations' tables if they exist."""
+    """Drops every table in the shared schema, plus the migration history."""
     print(f"Connecting to database at: {DATABASE_URL}")
     try:
         with engine.begin() as connection:
-            drop_conversation_table_sql = text(
-                """
-                DROP TABLE IF EXISTS conversations;
-                """
-            )
-            connection.execute(drop_conversation_table_sql)
-            drop_table_sql = text(
-                """
-                DROP TABLE IF EXISTS messages;
-                """
-            )
-            connection.execute(drop_table_sql)
+            Base.metadata.drop_all(connection, checkfirst=True)
         print("✅ Tables dropped successfully.")
     except Exception as e:
         print(f"❌ Error dropping tables: {e}")
@@ -41,47 +33,11 @@ def drop_tables():
 
 
 def initialize_database():
-    """Creates a simple 'messages' table if it doesn't exist."""
+    """Creates the tables from the shared schema and applies pending migrations."""
     print(f"Connecting to database at: {DATABASE_URL}")
     try:
-        with engine.begin() as connection:
-            # Use 'text' for raw SQL execution with SQLAlchemy
-            create_conversation_table_sql = text(
-                """
-                CREATE TABLE conversations (
-                username TEXT PRIMARY KEY,   
-                name TEXT,                   
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            );
-                """
-            )
-            connection.execute(create_conversation_table_sql)
-            create_table_sql = text(
-                """
-                CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_username TEXT NOT NULL REFERENCES conversations(username),
-                sender TEXT,
-                message TEXT,
-                timestamp DATETIME,
-                story_reply TEXT,
-                liked BOOLEAN,
-                timestamp_liked DATETIME,
-                attachment TEXT,
-                attachment_link TEXT,
-                reference_account TEXT,
-                audio BOOLEAN,
-                photo BOOLEAN,
-                video BOOLEAN
-                );
-                """
-            )
-            connection.execute(create_table_sql)
-            # Commit is often implicit with execute in autocommit mode or when block ends,
-            # but can be explicit if needed: connection.commit()
-        print(
-            "✅ Database initialized successfully (table 'messages' checked/created)."
-        )
+        version = migrate(engine)
+        print(f"✅ Database initialized successfully (schema version {version}).")
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
         exit(-1)
@@ -0,0 +1,148 @@
+# instagram_analyzer/src/db/manifest.py
+
+import hashlib
+import os
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from db.db_main import engine
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(file_path):
+    """Returns the SHA-256 hex digest of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest():
+    """
+    Loads the manifest of previously ingested files.
+
+    Returns:
+        dict: Maps each relative file path to a (size, mtime, content_hash) tuple.
+    """
+    with engine.connect() as connection:
+        result = connection.execute(
+            text("SELECT path, size, mtime, content_hash FROM ingested_files")
+        )
+        return {
+            path: (size, mtime, content_hash)
+            for path, size, mtime, content_hash in result
+        }
+
+
+def plan_ingest(file_paths, base_path):
+    """
+    Splits export files into the ones that need parsing and the ones to skip.
+
+    A file is unchanged when its size and mtime match the manifest, or when
+    they differ but its content hash does not (e.g. a fresh export of the same
+    conversation). Only new or changed files are returned for parsing.
+
+    Args:
+        file_paths (iterable): Absolute paths of the message_N.html files.
+        base_path (str): The inbox root; manifest paths are stored relative to it.
+
+    Returns:
+        tuple: (changed, touched). `changed` is a list of manifest entries for
+        files to (re)ingest, `touched` a list of entries for unchanged files
+        whose size/mtime should be refreshed.
+    """
+    manifest = load_manifest()
+    changed = []
+    touched = []
+
+    for full_path in file_paths:
+        stat = os.stat(full_path)
+        entry = {
+            "path": os.path.relpath(full_path, base_path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_hash": None,
+        }
+        previous = manifest.get(entry["path"])
+        if previous and previous[0] == entry["size"] and previous[1] == entry["mtime"]:
+            continue
+
+        entry["content_hash"] = file_hash(full_path)
+        if previous and previous[2] == entry["content_hash"]:
+            touched.append(entry)
+        else:
+            changed.append(entry)
+
+    return changed, touched
+
+
+def delete_file_messages(paths):
+    """Deletes the messages previously ingested from the given relative paths."""
+    if not paths:
+        return
+    delete_query = text("DELETE FROM messages WHERE source_file = :path")
+    try:
+        with engine.begin() as connection:
+            connection.execute(delete_query, [{"path": path} for path in paths])
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
+
+
+def delete_unsourced_messages(usernames):
+    """
+    Deletes the messages of the given conversations that have no source file.
+
+    Databases loaded before the manifest existed hold such rows and an empty
+    manifest, so their first re-run parses every file again; without this
+    every message would be inserted a second time.
+    """
+    if not usernames:
+        return
+    delete_query = text(
+        "DELETE FROM messages "
+        "WHERE source_file IS NULL AND conversation_username = :username"
+    )
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                delete_query, [{"username": username} for username in usernames]
+            )
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
+
+
+def record_ingested_files(entries):
+    """
+    Upserts manifest entries once their messages have been committed.
+
+    Args:
+        entries (list): Dictionaries with path, size, mtime and content_hash keys.
+    """
+    if not entries:
+        return
+    upsert_query = text(
+        """
+        INSERT INTO ingested_files (path, size, mtime, content_hash, ingested_at)
+        VALUES (:path, :size, :mtime, :content_hash, :ingested_at)
+        ON CONFLICT(path) DO UPDATE SET
+            size = excluded.size,
+            mtime = excluded.mtime,
+            content_hash = excluded.content_hash,
+            ingested_at = excluded.ingested_at
+        """
+    )
+    ingested_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                upsert_query,
+                [dict(entry, ingested_at=ingested_at) for entry in entries],
+            )
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
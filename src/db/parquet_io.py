@@ -0,0 +1,341 @@
+# instagram_analyzer/src/db/parquet_io.py
+#
+# Run from src/:
+#   python -m db.parquet_io export ../data/parquet
+#   python -m db.parquet_io import ../data/parquet --database supabase
+
+import argparse
+import os
+import shutil
+import tempfile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    func,
+    select,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.models import Conversation, Message
+
+DEFAULT_ROW_GROUP_SIZE = 50000
+DEFAULT_COMPRESSION = "zstd"
+# Partition directory value for rows without a conversation id or timestamp,
+# as understood by Hive-style partition readers
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _arrow_type(column):
+    if isinstance(column.type, (Integer, BigInteger)):
+        return pa.int64()
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    return pa.string()
+
+
+def arrow_schema(table):
+    """Builds a typed Arrow schema from a table of backend.models."""
+    return pa.schema(
+        [pa.field(column.name, _arrow_type(column)) for column in table.columns]
+    )
+
+
+def _partition_of(row):
+    conversation_id = row.conversation_id
+    timestamp = row.timestamp_iso_dt
+    return (
+        NULL_PARTITION if conversation_id is None else str(conversation_id),
+        NULL_PARTITION if timestamp is None else f"{timestamp:%Y-%m}",
+    )
+
+
+class _RowGroupWriter:
+    """Buffers rows column by column and writes them one row group at a time."""
+
+    def __init__(self, path, schema, row_group_size, compression):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.columns = {name: [] for name in schema.names}
+        self.rows = 0
+        self.writer = pq.ParquetWriter(path, schema, compression=compression)
+
+    def add(self, row):
+        for name in self.schema.names:
+            self.columns[name].append(row[name])
+        self.rows += 1
+        if self.rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pydict(self.columns, self.schema))
+            self.columns = {name: [] for name in self.schema.names}
+            self.rows = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def export_parquet(
+    engine,
+    out_dir,
+    row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    compression=DEFAULT_COMPRESSION,
+):
+    """
+    Writes 'conversations' and 'messages' to Parquet files under `out_dir`.
+
+    Messages are partitioned as messages/conversation=<id>/month=<YYYY-MM>/.
+    They are read in (conversation_id, timestamp_iso_dt) order, the order of
+    the composite index, so every partition is contiguous and only one file
+    is open at a time. Rows are streamed from the database and written a row
+    group at a time, so memory is bounded by `row_group_size`.
+
+    Files are written to a staging directory inside `out_dir` and replace the
+    previous export only once every row has been written, so a failed export
+    leaves no partial dataset behind.
+
+    Columns are typed from backend.models, so the database must be migrated
+    first: older SQLite ingest DBs hold text flags that read back as True.
+
+    Returns:
+        tuple: Number of conversations and messages written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".export-", dir=out_dir)
+    try:
+        counts = _write_parquet(engine, staging_dir, row_group_size, compression)
+        messages_dir = os.path.join(out_dir, "messages")
+        # A previous export's partitions would otherwise be mixed with this one
+        shutil.rmtree(messages_dir, ignore_errors=True)
+        os.replace(os.path.join(staging_dir, "messages"), messages_dir)
+        os.replace(
+            os.path.join(staging_dir, "conversations.parquet"),
+            os.path.join(out_dir, "conversations.parquet"),
+        )
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return counts
+
+
+def _write_parquet(engine, out_dir, row_group_size, compression):
+    """Writes the files of export_parquet under `out_dir`."""
+    messages_dir = os.path.join(out_dir, "messages")
+    conversations_path = os.path.join(out_dir, "conversations.parquet")
+    os.makedirs(messages_dir)
+
+    conversations_table = Conversation.__table__
+    messages_table = Message.__table__
+    conversation_count = message_count = 0
+
+    with engine.connect() as connection:
+        writer = _RowGroupWriter(
+            conversations_path,
+            arrow_schema(conversations_table),
+            row_group_size,
+            compression,
+        )
+        for row in connection.execute(
+            select(conversations_table).order_by(conversations_table.c.id)
+        ).mappings():
+            writer.add(row)
+            conversation_count += 1
+        writer.close()
+
+        schema = arrow_schema(messages_table)
+        rows = connection.execution_options(
+            stream_results=True, yield_per=row_group_size
+        ).execute(
+            select(messages_table).order_by(
+                messages_table.c.conversation_id,
+                messages_table.c.timestamp_iso_dt,
+                messages_table.c.id,
+            )
+        )
+        writer = partition = None
+        for row in rows.mappings():
+            row_partition = _partition_of(row)
+            if row_partition != partition:
+                if writer is not None:
+                    writer.close()
+                partition = row_partition
+                path = os.path.join(
+                    messages_dir,
+                    f"conversation={partition[0]}",
+                    f"month={partition[1]}",
+                    "part-0.parquet",
+                )
+                writer = _RowGroupWriter(path, schema, row_group_size, compression)
+            writer.add(row)
+            message_count += 1
+        if writer is not None:
+            writer.close()
+
+    return conversation_count, message_count
+
+
+def _parquet_batches(path, batch_size):
+    """Yields the rows of a Parquet file as lists of dicts, memory-mapped."""
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield batch.to_pylist()
+
+
+def _insert_ignoring_existing(engine, table):
+    """An INSERT that skips rows whose key already exists in `table`."""
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table).on_conflict_do_nothing()
+
+
+def import_parquet(engine, in_dir, batch_size=DEFAULT_ROW_GROUP_SIZE):
+    """
+    Loads an export_parquet directory into the database behind `engine`.
+
+    Files are memory-mapped and inserted `batch_size` rows per transaction.
+    Ids are kept, so messages stay linked to their conversations. Rows whose
+    key already exists are skipped, which makes re-running an import safe.
+
+    Returns:
+        tuple: Usernames of the imported conversations and the number of
+        message rows read.
+    """
+    conversations_table = Conversation.__table__
+    messages_table = Message.__table__
+    usernames = set()
+    message_count = 0
+
+    conversation_insert = _insert_ignoring_existing(engine, conversations_table)
+    for batch in _parquet_batches(
+        os.path.join(in_dir, "conversations.parquet"), batch_size
+    ):
+        with engine.begin() as connection:
+            connection.execute(conversation_insert, batch)
+        usernames.update(row["username"] for row in batch)
+
+    message_insert = _insert_ignoring_existing(engine, messages_table)
+    columns = set(messages_table.columns.keys())
+    messages_dir = os.path.join(in_dir, "messages")
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(messages_dir)
+        for name in names
+        if name.endswith(".parquet")
+    )
+    for path in paths:
+        for batch in _parquet_batches(path, batch_size):
+            rows = [
+                {name: value for name, value in row.items() if name in columns}
+                for row in batch
+            ]
+            with engine.begin() as connection:
+                connection.execute(message_insert, rows)
+            message_count += len(rows)
+
+    if engine.dialect.name == "postgresql":
+        # Explicit ids leave the serial sequence behind; move it past them
+        with engine.begin() as connection:
+            connection.execute(
+                select(
+                    func.setval(
+                        func.pg_get_serial_sequence("messages", "id"),
+                        select(
+                            func.coalesce(func.max(messages_table.c.id), 1)
+                        ).scalar_subquery(),
+                    )
+                )
+            )
+
+    return usernames, message_count
+
+
+def _local_engine():
+    from db.db_main import engine
+
+    return engine
+
+
+def _supabase_engine():
+    from backend.config import engine
+
+    return engine
+
+
+def refresh_after_import(database, usernames):
+    """Rebuilds the rollups of the imported conversations and bumps the generation."""
+    if database == "supabase":
+        from backend.rollups import refresh_hourly_counts, refresh_token_counts
+
+        refresh_hourly_counts()
+        refresh_token_counts()
+    else:
+        from db.db_main import (
+            bump_data_generation,
+            refresh_hourly_counts,
+            refresh_token_counts,
+        )
+
+        refresh_hourly_counts(usernames)
+        refresh_token_counts(usernames)
+        bump_data_generation()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export or import messages and conversations as Parquet."
+    )
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("directory")
+    parser.add_argument(
+        "--database",
+        choices=("local", "supabase"),
+        default="local",
+        help="the SQLite ingest DB (DATABASE_FILENAME) or SUPABASE_CONNECTION_STRING",
+    )
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    parser.add_argument("--compression", default=DEFAULT_COMPRESSION)
+    args = parser.parse_args()
+
+    engine = _supabase_engine() if args.database == "supabase" else _local_engine()
+    from backend.migrations import migrate
+
+    try:
+        # Also clears values older ingests stored that cannot be read back
+        migrate(engine)
+        if args.command == "export":
+            conversations, messages = export_parquet(
+                engine, args.directory, args.row_group_size, args.compression
+            )
+            print(
+                f"✅ Exported {conversations} conversations and {messages} messages to {args.directory}"
+            )
+        else:
+            usernames, messages = import_parquet(
+                engine, args.directory, args.row_group_size
+            )
+            refresh_after_import(args.database, usernames)
+            print(
+                f"✅ Imported {len(usernames)} conversations and {messages} messages from {args.directory}"
+            )
+    except (SQLAlchemyError, OSError, ValueError) as e:
+        # ValueError: a stored value does not match its column type
+        print(f"An error occurred: {e}")
+        exit(-1)
+
+
+if __name__ == "__main__":
+    main()
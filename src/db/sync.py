@@ -0,0 +1,330 @@
+# instagram_analyzer/src/db/sync.py
+#
+# Run from src/ after an ingest:
+#   python -m db.sync
+#   python -m db.sync --full   # after a full rebuild of the ingest DB
+
+import argparse
+import io
+from sqlalchemy import column, func, or_, select, table, text, true
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.models import (
+    Conversation,
+    DataGeneration,
+    IngestedFile,
+    Message,
+    SyncedFile,
+    SyncState,
+)
+
+DEFAULT_BATCH_SIZE = 50000
+# File paths per IN (...) list, well under SQLite's bound parameter limit
+SQL_LIST_CHUNK_SIZE = 500
+# sync_state key of the SQLite ingest DB
+SOURCE_NAME = "sqlite"
+
+
+def _copy_value(value):
+    """Formats one value for COPY ... FROM STDIN in the text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _copy_rows(cursor, table_name, columns, rows):
+    """Streams `rows` into `table_name` with one COPY."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_value(row[name]) for name in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table_name} ({', '.join(columns)}) FROM STDIN", buffer, size=1 << 20
+    )
+
+
+def _upsert_from_stage(target_table, stage_name, columns, key):
+    """INSERT ... SELECT from the staging table, updating rows whose key exists."""
+    stage = table(stage_name, *(column(name) for name in columns))
+    statement = insert(target_table).from_select(columns, select(stage))
+    return statement.on_conflict_do_update(
+        index_elements=[key],
+        set_={name: statement.excluded[name] for name in columns if name != key},
+    )
+
+
+def _create_stage(connection, table_name, columns):
+    """A session-local copy of `table_name`'s columns, emptied at every commit."""
+    stage_name = f"sync_stage_{table_name}"
+    connection.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage_name} ON COMMIT DELETE ROWS AS "
+            f"SELECT {', '.join(columns)} FROM {table_name} WITH NO DATA"
+        )
+    )
+    return stage_name
+
+
+def _copy_upsert(connection, target_table, columns, key, rows):
+    """COPYs a batch into the staging table and upserts it into `target_table`."""
+    stage_name = _create_stage(connection, target_table.name, columns)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        _copy_rows(cursor, stage_name, columns, rows)
+    finally:
+        cursor.close()
+    connection.execute(_upsert_from_stage(target_table, stage_name, columns, key))
+    # The sync is one transaction; without this each batch upserts all earlier ones again
+    connection.execute(text(f"TRUNCATE {stage_name}"))
+
+
+def load_state(target):
+    """Returns the source data generation synced last, or None before any sync."""
+    with target.connect() as connection:
+        return connection.execute(
+            select(SyncState.source_generation).where(SyncState.source == SOURCE_NAME)
+        ).scalar()
+
+
+def source_generation(source):
+    """Returns the source's current data generation."""
+    with source.connect() as connection:
+        return (
+            connection.execute(
+                select(DataGeneration.generation).where(DataGeneration.id == 1)
+            ).scalar()
+            or 0
+        )
+
+
+def source_files(source):
+    """Maps each file in the source's ingest manifest to its (hash, ingested_at)."""
+    with source.connect() as connection:
+        rows = connection.execute(
+            select(
+                IngestedFile.path, IngestedFile.content_hash, IngestedFile.ingested_at
+            )
+        )
+        return {
+            path: (content_hash, ingested_at)
+            for path, content_hash, ingested_at in rows
+        }
+
+
+def synced_files(target):
+    """Maps each file synced into the target to its (hash, ingested_at) then."""
+    with target.connect() as connection:
+        rows = connection.execute(
+            select(
+                SyncedFile.path, SyncedFile.content_hash, SyncedFile.ingested_at
+            ).where(SyncedFile.source == SOURCE_NAME)
+        )
+        return {
+            path: (content_hash, ingested_at)
+            for path, content_hash, ingested_at in rows
+        }
+
+
+def _unmanifested(manifest_paths):
+    """Messages whose source file is not among the `manifest_paths` select."""
+    source_file = Message.__table__.c.source_file
+    return or_(source_file.is_(None), source_file.not_in(manifest_paths))
+
+
+def _fingerprint(engine, condition):
+    """(count, min id, max id) of the messages matching `condition`."""
+    messages = Message.__table__
+    with engine.connect() as connection:
+        return tuple(
+            connection.execute(
+                select(
+                    func.count(), func.min(messages.c.id), func.max(messages.c.id)
+                ).where(condition)
+            ).one()
+        )
+
+
+def _chunks(items, size=SQL_LIST_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def sync(source, target, full=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Copies messages of new or re-ingested export files from `source` into `target`.
+
+    The source's ingested_files manifest says which file every message came
+    from and when it was last ingested. The target keeps a copy of it in
+    synced_files; every file whose content hash or ingest time differs from
+    that copy has all of its target rows deleted and all of its source rows
+    sent again, whatever their ids. SQLite reuses the ids of deleted rows, so
+    ids alone cannot tell which rows are new. Files gone from the manifest
+    are deleted from the target. Messages from no manifest file, such as
+    those loaded before the manifest existed, are resent together whenever
+    their count or id range differs between the two databases.
+
+    Rows are read in id order and sent `batch_size` at a time with COPY into
+    a staging table, then upserted. The deletes, every batch and the manifest
+    copy commit in one transaction, so readers of the target see either the
+    previous rows or the new ones, never a conversation half resent, and a
+    failed sync leaves the target as it was.
+
+    A full resync replaces every message in the target. It is forced on the
+    first sync and when the source looks rebuilt: its generation went
+    backwards. sync_state keeps only that generation; message ids are never
+    used to pick rows.
+
+    Returns:
+        tuple: Number of messages copied and of stale target rows deleted, or
+        None when the target was already up to date.
+    """
+    messages = Message.__table__
+    conversations = Conversation.__table__
+    message_columns = [column.name for column in messages.columns]
+    conversation_columns = [column.name for column in conversations.columns]
+
+    synced_generation = load_state(target)
+    generation = source_generation(source)
+    manifest = source_files(source)
+    synced = synced_files(target)
+    if synced_generation is not None and not full and generation < synced_generation:
+        print("The ingest DB was rebuilt since the last sync; resyncing in full.")
+        full = True
+    # Targets synced before synced_files existed have no copy of the manifest
+    if synced_generation is None or (manifest and not synced):
+        full = True
+
+    changed = sorted(path for path in manifest if synced.get(path) != manifest[path])
+    removed = sorted(set(synced) - set(manifest))
+    source_rest = _unmanifested(select(IngestedFile.path))
+    target_rest = _unmanifested(
+        select(SyncedFile.path).where(SyncedFile.source == SOURCE_NAME)
+    )
+
+    resend_rest = _fingerprint(source, source_rest) != _fingerprint(target, target_rest)
+    if not (full or changed or removed or resend_rest):
+        return None
+    if full:
+        selections = [true()]
+    else:
+        selections = [messages.c.source_file.in_(paths) for paths in _chunks(changed)]
+        if resend_rest:
+            selections.append(source_rest)
+
+    with source.connect() as reader, target.connect() as writer, writer.begin():
+        if full:
+            deleted = writer.execute(messages.delete()).rowcount
+            # A rebuilt source may have numbered its conversations anew
+            writer.execute(conversations.delete())
+        else:
+            deleted = 0
+            for paths in _chunks(changed + removed):
+                deleted += writer.execute(
+                    messages.delete().where(messages.c.source_file.in_(paths))
+                ).rowcount
+            if resend_rest:
+                deleted += writer.execute(messages.delete().where(target_rest)).rowcount
+        # Few enough to resend every time; messages reference their ids
+        rows = reader.execute(select(conversations)).mappings().all()
+        if rows:
+            _copy_upsert(writer, conversations, conversation_columns, "username", rows)
+
+        copied = 0
+        for selection in selections:
+            result = reader.execution_options(
+                stream_results=True, yield_per=batch_size
+            ).execute(select(messages).where(selection).order_by(messages.c.id))
+            for batch in result.mappings().partitions(batch_size):
+                _copy_upsert(writer, messages, message_columns, "id", batch)
+                copied += len(batch)
+
+        # New rows inserted directly into the target must not reuse ids
+        writer.execute(
+            select(
+                func.setval(
+                    func.pg_get_serial_sequence("messages", "id"),
+                    select(func.coalesce(func.max(messages.c.id), 1)).scalar_subquery(),
+                )
+            )
+        )
+        writer.execute(
+            SyncedFile.__table__.delete().where(SyncedFile.source == SOURCE_NAME)
+        )
+        if manifest:
+            writer.execute(
+                SyncedFile.__table__.insert(),
+                [
+                    {
+                        "source": SOURCE_NAME,
+                        "path": path,
+                        "content_hash": content_hash,
+                        "ingested_at": ingested_at,
+                    }
+                    for path, (content_hash, ingested_at) in manifest.items()
+                ],
+            )
+        state_insert = insert(SyncState.__table__).values(
+            source=SOURCE_NAME,
+            source_generation=generation,
+            synced_at=func.now(),
+        )
+        writer.execute(
+            state_insert.on_conflict_do_update(
+                index_elements=["source"],
+                set_={
+                    name: state_insert.excluded[name]
+                    for name in ("source_generation", "synced_at")
+                },
+            )
+        )
+
+    return copied, deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Copy new messages from the SQLite ingest DB to Supabase."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="replace every message in Supabase instead of sending the delta",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from backend.config import engine as target
+    from backend.migrations import migrate
+    from db.db_main import engine as source
+
+    try:
+        # The source too: older ingest DBs hold flags that read back wrong
+        migrate(source)
+        migrate(target)
+        counts = sync(source, target, args.full, args.batch_size)
+        if counts is None:
+            print("✅ Supabase is already up to date.")
+            return
+        from backend.rollups import refresh_hourly_counts, refresh_token_counts
+
+        refresh_hourly_counts()
+        refresh_token_counts()
+        copied, deleted = counts
+        print(f"✅ Copied {copied} messages and removed {deleted} replaced ones.")
+    except SQLAlchemyError as e:
+        print(f"An error occurred: {e}")
+        exit(-1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,51 @@
 # instagram_analyzer/src/main.py
 
-from db.db_main import add_conversation_row, add_message_row
+from db.db_main import (
+    add_conversation_row,
+    add_message_rows,
+    bump_data_generation,
+    enable_fast_load,
+    refresh_hourly_counts,
+    refresh_token_counts,
+)
 from db.db_setup import initialize_database
 from db.db_setup import drop_tables
+from db.manifest import (
+    delete_file_messages,
+    delete_unsourced_messages,
+    plan_ingest,
+    record_ingested_files,
+)
+import argparse
 import os
-from parsing.parser import parse_html_file
+from parsing.pipeline import parse_files
+from parsing.resolver import load_usernames, resolve_directories
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Ingest an Instagram DM export.")
+    arg_parser.add_argument(
+        "--fast-load",
+        action="store_true",
+        help="Relax SQLite durability (WAL, synchronous=OFF) for the initial load.",
+    )
+    arg_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes parsing HTML files in parallel.",
+    )
+    arg_parser.add_argument(
+        "--inbox",
+        default="../data/instagram-aryanthakxr/your_instagram_activity/messages/inbox",
+        help="Path to the export's messages/inbox directory.",
+    )
+    arg_parser.add_argument(
+        "--usernames",
+        default="usernames.txt",
+        help="File mapping inbox directory prefixes to usernames.",
+    )
+    args = arg_parser.parse_args()
+
     print("Running main script...")
     print("Choose an option or enter any other key to skip:")
     print("1. Drop tables")
@@ -23,56 +62,84 @@ if __name__ == "__main__":
         drop_tables()
         initialize_database()
     else:
-        print("Skipping.")
-
-    instagram_names = {}
-
-    with open("usernames.txt", "r") as file:
-        for line in file:
-            if "=" in line:
-                key, value = line.strip().split("=", 1)
-                instagram_names[key] = value
-
-    base_path = "../data/instagram-aryanthakxr/your_instagram_activity/messages/inbox"
-
-    for subdir_name in os.listdir(base_path):
-        if (subdir_name.split("_")[0] in instagram_names) and instagram_names[
-            subdir_name.split("_")[0]
-        ] not in [
-            "bot",
-            "group",
-        ]:
-            full_subdir_path = os.path.join(base_path, subdir_name)
-
-            if os.path.isdir(full_subdir_path):
-                # Find which prefix (if any) matches this subdir
-                matching_prefix = next(
-                    (
-                        prefix
-                        for prefix in instagram_names.keys()
-                        if subdir_name.startswith(prefix)
-                    ),
-                    None,
-                )
-
-                if matching_prefix:
-                    print("Processing:", matching_prefix)
-                    conversation_data = {
-                        "username": instagram_names[matching_prefix],
-                        "name": matching_prefix,
-                    }
-                    add_conversation_row(conversation_data)
-
-                    for file_name in os.listdir(full_subdir_path):
-                        if file_name.endswith(".html"):
-                            full_path = os.path.join(full_subdir_path, file_name)
-                            data_list = parse_html_file(full_path)
-                            for data in data_list:
-                                if data:
-                                    data["conversation_username"] = instagram_names[
-                                        matching_prefix
-                                    ]
-                                    # print(data)
-                                    add_message_row(data)
+        print("Skipping. Applying any pending schema migrations.")
+        initialize_database()
+
+    instagram_names = load_usernames(args.usernames)
+
+    if args.fast_load:
+        enable_fast_load()
+
+    base_path = args.inbox
+
+    subdir_names = [
+        subdir_name
+        for subdir_name in os.listdir(base_path)
+        if os.path.isdir(os.path.join(base_path, subdir_name))
+    ]
+    resolved, ignored, unmatched = resolve_directories(subdir_names, instagram_names)
+
+    file_usernames = {}
+    file_conversation_ids = {}
+
+    for subdir_name, (prefix, username) in resolved.items():
+        print("Processing:", prefix)
+        conversation_data = {
+            "username": username,
+            "name": prefix,
+        }
+        conversation_id = add_conversation_row(conversation_data)
+
+        full_subdir_path = os.path.join(base_path, subdir_name)
+        for file_name in os.listdir(full_subdir_path):
+            if file_name.endswith(".html"):
+                full_path = os.path.join(full_subdir_path, file_name)
+                file_usernames[full_path] = username
+                file_conversation_ids[full_path] = conversation_id
+
+    print(
+        f"Resolved {len(resolved)} conversations, "
+        f"ignored {len(ignored)} bots/groups, {len(unmatched)} unmatched."
+    )
+    if unmatched:
+        print("Add these to usernames.txt to ingest them:")
+        for subdir_name in sorted(unmatched):
+            print(f"  {subdir_name}")
+
+    # Only new or changed files are parsed; their previous rows are replaced
+    changed_files, touched_files = plan_ingest(file_usernames, base_path)
+    print(
+        f"{len(changed_files)} new or changed files, "
+        f"{len(file_usernames) - len(changed_files)} unchanged."
+    )
+    source_files = {
+        os.path.join(base_path, entry["path"]): entry["path"] for entry in changed_files
+    }
+    changed_usernames = set(file_usernames[full_path] for full_path in source_files)
+    # Rows from before the manifest are replaced along with their files
+    delete_unsourced_messages(changed_usernames)
+    delete_file_messages(list(source_files.values()))
+
+    def message_rows():
+        for full_path, data_list in parse_files(source_files, workers=args.workers):
+            for data in data_list:
+                if data:
+                    data["conversation_username"] = file_usernames[full_path]
+                    data["conversation_id"] = file_conversation_ids[full_path]
+                    data["source_file"] = source_files[full_path]
+                    yield data
+
+    # Parsers stream into this single writer, one executemany per batch
+    inserted = add_message_rows(message_rows())
+    print(f"Inserted {inserted} messages from {len(source_files)} files.")
+
+    refresh_hourly_counts(changed_usernames)
+    refresh_token_counts(changed_usernames)
+
+    # Recorded only after the rows are committed, so an interrupted run retries
+    record_ingested_files(changed_files + touched_files)
+
+    if changed_files:
+        print(f"Data generation is now {bump_data_generation()}.")
 
     print("Main script finished.")
@@ -1,24 +1,90 @@
+import argparse
+import os
 import pandas as pd
-import re
 
-# Load the CSV
-df = pd.read_csv("cleaned_file.csv")
+TIMESTAMP_COLUMN = "timestamp_iso_dt"
+# ISO 8601 timestamp with a space instead of 'T' and no fraction or offset
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIMESTAMP_LENGTH = len("2025-05-01 12:00:00")
+DEFAULT_CHUNK_SIZE = 100_000
 
-# Define ISO 8601 timestamp pattern (no 'T', just space)
-iso_pattern = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
 
-# Find rows where timestamp_iso_dt is invalid or NaN
-invalid_mask = ~df["timestamp_iso_dt"].astype(str).str.match(iso_pattern)
+def valid_timestamp_mask(values):
+    """
+    Flags the values that are complete "YYYY-MM-DD HH:MM:SS" timestamps.
 
-# Print the invalid rows
-print("Invalid timestamp rows:")
-print(df[invalid_mask])
+    Both checks run over the whole column at once: a length test, then a
+    strict parse that also rejects impossible dates such as "2025-02-30".
 
-# Drop those rows
-df_cleaned = df[~invalid_mask].copy()
+    Returns:
+        pandas.Series: Boolean mask aligned with `values`.
+    """
+    parsed = pd.to_datetime(values, format=TIMESTAMP_FORMAT, errors="coerce")
+    return (values.str.len() == TIMESTAMP_LENGTH) & parsed.notna()
 
-# Save to new CSV
-df_cleaned.to_csv("dm_data_cleaned.csv", index=False)
 
-print(f"\n✅ Cleaned data saved to 'dm_data_cleaned.csv'.")
-print(f"Removed {invalid_mask.sum()} rows with invalid timestamps.")
+def clean_csv(
+    input_path,
+    output_path,
+    rejected_path=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    column=TIMESTAMP_COLUMN,
+):
+    """
+    Copies a messages CSV, dropping rows whose `column` is not a valid timestamp.
+
+    The input is read `chunk_size` rows at a time and each chunk is appended
+    to the output, so memory stays bounded by the chunk size rather than the
+    file size. Cells are read as strings and written back unchanged. Dropped
+    rows go to `rejected_path` when one is given.
+
+    Returns:
+        tuple: Number of rows kept and rows rejected.
+    """
+    kept = rejected = 0
+    first_chunk = True
+    for chunk in pd.read_csv(
+        input_path, dtype=str, na_filter=False, chunksize=chunk_size
+    ):
+        valid = valid_timestamp_mask(chunk[column])
+        mode = "w" if first_chunk else "a"
+        chunk[valid].to_csv(output_path, mode=mode, header=first_chunk, index=False)
+        if rejected_path:
+            chunk[~valid].to_csv(
+                rejected_path, mode=mode, header=first_chunk, index=False
+            )
+        kept += int(valid.sum())
+        rejected += len(chunk) - int(valid.sum())
+        first_chunk = False
+    return kept, rejected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drop rows with invalid timestamps from a messages CSV."
+    )
+    parser.add_argument("input", nargs="?", default="cleaned_file.csv")
+    parser.add_argument("output", nargs="?", default="dm_data_cleaned.csv")
+    parser.add_argument(
+        "--rejected",
+        help="where to write the dropped rows (default: <output>_rejected.csv)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--column", default=TIMESTAMP_COLUMN)
+    args = parser.parse_args(argv)
+
+    rejected_path = args.rejected or (
+        f"{os.path.splitext(args.output)[0]}_rejected.csv"
+    )
+    kept, rejected = clean_csv(
+        args.input, args.output, rejected_path, args.chunk_size, args.column
+    )
+
+    print(f"\n✅ Cleaned data saved to '{args.output}'.")
+    print(f"Removed {rejected} rows with invalid timestamps (kept {kept}).")
+    if rejected:
+        print(f"Removed rows saved to '{rejected_path}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,164 +1,196 @@
-from bs4 import BeautifulSoup
+from lxml import etree
+
+from parsing.timestamps import to_iso
+
+SENDER_CLASS = "_3-95 _2pim _a6-h _a6-i"
+WRAPPER_CLASS = "_3-95 _a6-p"
+TIMESTAMP_CLASS = "_3-94 _a6-o"
+
+
+def _class_of(element):
+    # Normalise whitespace the same way BeautifulSoup compares multi-class strings
+    return " ".join(element.get("class", "").split())
+
+
+def _text(element):
+    """Equivalent of BeautifulSoup's get_text(strip=True)."""
+    return "".join(part.strip() for part in element.itertext() if part and part.strip())
+
+
+def _first_anchor(element):
+    for anchor in element.iterdescendants("a"):
+        if anchor.get("href") is not None:
+            return anchor
+    return None
+
+
+def _extract_message(div):
+    """
+    Extracts one message record from a 'uiBoxWhite' div in a single walk.
+
+    Returns:
+        dict | None: The message record, or None if the message should be skipped.
+    """
+    sender_div = None
+    wrapper_div = None
+    timestamp_div = None
+    anchor_tag = None
+    span_tag = None
+    audio = video = photo = False
+
+    for element in div.iterdescendants():
+        tag = element.tag
+        if tag == "div":
+            if sender_div is None or wrapper_div is None or timestamp_div is None:
+                css_class = _class_of(element)
+                if sender_div is None and css_class == SENDER_CLASS:
+                    sender_div = element
+                elif wrapper_div is None and css_class == WRAPPER_CLASS:
+                    wrapper_div = element
+                elif timestamp_div is None and css_class == TIMESTAMP_CLASS:
+                    timestamp_div = element
+        elif tag == "a":
+            if anchor_tag is None and element.get("href") is not None:
+                anchor_tag = element
+        elif tag == "span":
+            if span_tag is None:
+                span_tag = element
+        elif tag == "audio":
+            audio = True
+        elif tag == "video":
+            video = True
+        elif tag == "img":
+            photo = True
+
+    # Extract sender
+    sender = _text(sender_div) if sender_div is not None else None
+    if sender and sender.startswith("Aryan Thakur"):
+        sender = "self"
+    else:
+        sender = "unknown"
+
+    # Extract message and, for shared stories, the referenced account
+    message = None
+    reference_account = None
+    if wrapper_div is not None:
+        inner_wrapper = next(wrapper_div.iterdescendants("div"), None)
+        if inner_wrapper is not None:
+            sibling_divs = [child for child in inner_wrapper if child.tag == "div"]
+            if len(sibling_divs) > 1:
+                message = _text(sibling_divs[1])
+            if len(sibling_divs) >= 3:
+                story_anchor = _first_anchor(sibling_divs[2])
+                if story_anchor is not None and "/stories/" in story_anchor.get("href"):
+                    message = "Sent a story"
+                    parts = story_anchor.get("href").split("/stories/")
+                    if len(parts) > 1:
+                        reference_account = parts[1].split("/")[0]
+
+    timestamp = _text(timestamp_div) if timestamp_div is not None else None
+
+    href = anchor_tag.get("href") if anchor_tag is not None else None
+    story_reply = bool(href and "/stories/aryanthakxr" in href)
+
+    # A reaction renders as a <span> holding the reactor and time in a child <span>
+    liked = span_tag is not None
+    timestamp_liked = None
+    if liked:
+        timestamp_span = next(span_tag.iterdescendants("span"), None)
+        if timestamp_span is not None:
+            timestamp_liked = _text(timestamp_span)
+            if (
+                timestamp_liked
+                and timestamp_liked.startswith("(")
+                and timestamp_liked.endswith(")")
+            ):
+                timestamp_liked = timestamp_liked[1:-1]
+            # The column is a DateTime; text that is not a timestamp is dropped
+            timestamp_liked = to_iso(timestamp_liked)
+
+    if audio:
+        message = "Sent a voice recording"
+    if video:
+        message = "Sent a video"
+    if photo:
+        message = "Sent a photo"
+
+    attachment = bool(message and "sent an attachment." in message.lower())
+    attachment_link = href if href and ("/reel/" in href or "/p/" in href) else None
+
+    # Skip if the message starts with a Hindi/Devanagari character
+    if message and ord(message[0]) in range(0x0900, 0x097F):
+        return None
+    if message and message.startswith("Liked a message"):
+        return None
+
+    return {
+        "sender": sender,
+        "message": message,
+        "timestamp": timestamp,
+        "timestamp_iso": to_iso(timestamp),
+        "story_reply": story_reply,
+        "liked": liked,
+        "timestamp_liked": timestamp_liked,
+        "attachment": attachment,
+        "attachment_link": attachment_link,
+        "reference_account": reference_account,
+        "audio": audio,
+        "video": video,
+        "photo": photo,
+    }
+
+
+def iter_html_file(file_path):
+    """
+    Streams message records out of an exported message_N.html file.
+
+    Each 'uiBoxWhite' div is handled as soon as lxml finishes it and is then
+    cleared, together with already processed siblings, so memory stays bounded
+    by one message rather than the whole document.
+
+    Args:
+        file_path (str): The path to the HTML file to be parsed.
+
+    Yields:
+        dict: One record per message, identical to parse_html_file's entries.
+    """
+    context = etree.iterparse(
+        file_path, events=("end",), tag="div", html=True, encoding="utf-8"
+    )
+    for _, div in context:
+        if "uiBoxWhite" not in div.get("class", "").split():
+            continue
+        record = _extract_message(div)
+        div.clear(keep_tail=True)
+        parent = div.getparent()
+        if parent is not None:
+            while div.getprevious() is not None:
+                del parent[0]
+        if record is not None:
+            yield record
+    del context
 
 
 def parse_html_file(file_path):
     """
-    Opens an HTML file and parses it using BeautifulSoup with the lxml parser.
+    Opens an HTML file and parses every message in it.
 
     Args:
         file_path (str): The path to the HTML file to be parsed.
 
     Returns:
-        BeautifulSoup: A BeautifulSoup object representing the parsed HTML.
+        list: One dictionary per message, as produced by iter_html_file.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as file:
-            content = file.read()
-            soup = BeautifulSoup(content, "lxml")
-            # Remove the head section
-            if soup.head:
-                soup.head.decompose()
-
-            # Find all divs with the class 'uiBoxWhite' in the body
-            divs = soup.body.find_all("div", class_="uiBoxWhite")
-
-            extracted_data = []
-
-            for div in divs:
-                # Extract sender
-                sender_div = div.find("div", class_="_3-95 _2pim _a6-h _a6-i")
-                sender = sender_div.get_text(strip=True) if sender_div else None
-                if sender and sender.startswith("Aryan Thakur"):
-                    sender = "self"
-                else:
-                    sender = "unknown"
-
-                # Extract message
-                message = None
-                wrapper_div = div.find("div", class_="_3-95 _a6-p")
-                if wrapper_div:
-                    inner_wrapper = wrapper_div.find(
-                        "div"
-                    )  # No class, just the first inner <div>
-                    if inner_wrapper:
-                        sibling_divs = inner_wrapper.find_all("div", recursive=False)
-                        if len(sibling_divs) > 1:
-                            message = sibling_divs[1].get_text(strip=True)
-
-                # Extract timestamp (from parent div, not wrapper)
-                timestamp_div = div.find("div", class_="_3-94 _a6-o")
-                timestamp = (
-                    timestamp_div.get_text(strip=True) if timestamp_div else None
-                )
-
-                # Check if the div contains an anchor tag with href containing "/stories/"
-                story_reply = False
-                anchor_tag = div.find("a", href=True)
-                if anchor_tag and "/stories/aryanthakxr" in anchor_tag["href"]:
-                    story_reply = True
-
-                # Check if the div contains a <span> tag
-                liked = False
-                timestamp_liked = None
-                span_tag = div.find("span")
-                if span_tag:
-                    liked = True
-                    # Extract timestamp from the child <span> tag
-                    timestamp_span = span_tag.find("span")
-                    if timestamp_span:
-                        timestamp_liked = timestamp_span.get_text(strip=True)
-                        if (
-                            timestamp_liked
-                            and timestamp_liked.startswith("(")
-                            and timestamp_liked.endswith(")")
-                        ):
-                            timestamp_liked = timestamp_liked[
-                                1:-1
-                            ]  # Remove the surrounding parentheses
-
-                reference_account = None
-
-                if wrapper_div:
-                    inner_wrapper = wrapper_div.find("div")
-                    if inner_wrapper:
-                        sibling_divs = inner_wrapper.find_all("div", recursive=False)
-                        if len(sibling_divs) >= 3:
-                            container_div = sibling_divs[2]
-                            anchor_tag = container_div.find("a", href=True)
-                            if anchor_tag and "/stories/" in anchor_tag["href"]:
-                                message = "Sent a story"
-
-                                # Extract username from href
-                                href = anchor_tag["href"]
-                                parts = href.split("/stories/")
-                                if len(parts) > 1:
-                                    reference_account = parts[1].split("/")[0]
-
-                audio = False
-
-                # Check if the div contains an <audio> tag
-                if div.find("audio"):
-                    audio = True
-                    message = "Sent a voice recording"
-
-                video = False
-
-                # Check if the div contains a <video> tag
-                if div.find("video"):
-                    video = True
-                    message = "Sent a video"
-
-                photo = False
-
-                # Check if the div contains an <img> tag
-                if div.find("img"):
-                    photo = True
-                    message = "Sent a photo"
-
-                attachment = False
-                attachment_link = None
-
-                # Check if the message contains "sent an attachment."
-                if message and "sent an attachment." in message.lower():
-                    attachment = True
-
-                # Find an anchor tag with /reel/ or /p/ in the href
-                anchor_tag = div.find("a", href=True)
-                if anchor_tag and (
-                    "/reel/" in anchor_tag["href"] or "/p/" in anchor_tag["href"]
-                ):
-                    attachment_link = anchor_tag["href"]
-
-                # Skip if the message starts with a Hindi/Devanagari character
-                if message and ord(message[0]) in range(0x0900, 0x097F):
-                    continue
-                if message and message.startswith("Liked a message"):
-                    continue
-
-                extracted_data.append(
-                    {
-                        "sender": sender,
-                        "message": message,
-                        "timestamp": timestamp,
-                        "story_reply": story_reply,
-                        "liked": liked,
-                        "timestamp_liked": timestamp_liked if liked else None,
-                        "attachment": attachment,
-                        "attachment_link": attachment_link,
-                        "reference_account": reference_account,
-                        "audio": audio,
-                        "video": video,
-                        "photo": photo,
-                    }
-                )
-
-            if not extracted_data:
-                print(f"No divs found!")
-                exit(-1)
-
-            return extracted_data
-
-    except FileNotFoundError:
+        extracted_data = list(iter_html_file(file_path))
+
+        if not extracted_data:
+            print(f"No divs found!")
+            exit(-1)
+
+        return extracted_data
+
+    except (FileNotFoundError, OSError):
         print(f"Error: The file at {file_path} was not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
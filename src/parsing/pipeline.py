@@ -0,0 +1,43 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from parsing.parser import parse_html_file
+
+
+def parse_files(file_paths, workers=1, max_pending=None):
+    """
+    Parses HTML export files, optionally across a pool of worker processes.
+
+    Results are yielded as soon as each file is parsed, so a single writer can
+    insert them while the pool keeps working. At most `max_pending` files are
+    in flight at once, which bounds how many parsed results sit in memory.
+
+    Args:
+        file_paths (iterable): Paths of the message_N.html files to parse.
+        workers (int): Number of parser processes. 1 parses in-process.
+        max_pending (int): Cap on submitted-but-unconsumed files (default 2 * workers).
+
+    Yields:
+        tuple: (file_path, list of message dicts) in completion order.
+    """
+    if workers <= 1:
+        for file_path in file_paths:
+            yield file_path, parse_html_file(file_path)
+        return
+
+    max_pending = max_pending or workers * 2
+    paths = iter(file_paths)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for file_path in paths:
+            pending[pool.submit(parse_html_file, file_path)] = file_path
+            if len(pending) < max_pending:
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
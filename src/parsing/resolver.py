@@ -0,0 +1,52 @@
+IGNORED_USERNAMES = ("bot", "group")
+
+
+def load_usernames(file_path="usernames.txt"):
+    """
+    Loads the `name=username` mapping used to label inbox directories.
+
+    Returns:
+        dict: Maps the directory name prefix to the Instagram username.
+    """
+    instagram_names = {}
+    with open(file_path, "r") as file:
+        for line in file:
+            if "=" in line:
+                key, value = line.strip().split("=", 1)
+                instagram_names[key] = value
+    return instagram_names
+
+
+def directory_key(subdir_name):
+    """Returns the part of an inbox directory name before its numeric suffix."""
+    return subdir_name.rsplit("_", 1)[0]
+
+
+def resolve_directories(subdir_names, instagram_names):
+    """
+    Resolves inbox directory names to usernames with one dict lookup each.
+
+    Args:
+        subdir_names (iterable): Directory names such as "aakritisharma_1569915541075348".
+        instagram_names (dict): The mapping returned by load_usernames.
+
+    Returns:
+        tuple: (resolved, ignored, unmatched). `resolved` maps each directory to
+        its (prefix, username); `ignored` lists directories mapped to a bot or
+        group; `unmatched` lists directories with no entry in the mapping.
+    """
+    resolved = {}
+    ignored = []
+    unmatched = []
+
+    for subdir_name in subdir_names:
+        prefix = directory_key(subdir_name)
+        username = instagram_names.get(prefix)
+        if username is None:
+            unmatched.append(subdir_name)
+        elif username in IGNORED_USERNAMES:
+            ignored.append(subdir_name)
+        else:
+            resolved[subdir_name] = (prefix, username)
+
+    return resolved, ignored, unmatched
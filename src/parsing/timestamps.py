@@ -0,0 +1,25 @@
+from datetime import datetime
+from functools import lru_cache
+
+EXPORT_TIMESTAMP_FORMAT = "%b %d, %Y %I:%M %p"  # e.g. "Apr 26, 2025 10:15 pm"
+ISO_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@lru_cache(maxsize=1 << 16)
+def to_iso(timestamp):
+    """
+    Converts an export timestamp to ISO 8601 ("YYYY-MM-DD HH:MM:SS").
+
+    Export timestamps only have minute resolution, so a conversation repeats
+    the same string many times; results are memoized to run strptime once
+    per distinct minute.
+
+    Returns:
+        str | None: The ISO timestamp, or None if the string cannot be parsed.
+    """
+    try:
+        return datetime.strptime(timestamp, EXPORT_TIMESTAMP_FORMAT).strftime(
+            ISO_TIMESTAMP_FORMAT
+        )
+    except (TypeError, ValueError):
+        return None
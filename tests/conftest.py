@@ -0,0 +1,142 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+# The modules are imported from src/, as when running them with python -m
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+# backend.config builds its engine at import; tests pass their own engines
+os.environ.setdefault(
+    "SUPABASE_CONNECTION_STRING", "postgresql+psycopg2://localhost/unused"
+)
+
+from backend.migrations import migrate  # noqa: E402
+from backend.models import Conversation, Message  # noqa: E402
+from backend.rollups import REFRESH_HOURLY_COUNTS_SQL  # noqa: E402
+
+# The tables as the first version of this project created them
+BASELINE_SCHEMA = (
+    """
+    CREATE TABLE messages (
+        id INTEGER NOT NULL PRIMARY KEY,
+        conversation_username TEXT,
+        sender TEXT,
+        message TEXT,
+        timestamp TEXT,
+        timestamp_iso DATETIME,
+        story_reply TEXT,
+        liked BOOLEAN,
+        timestamp_liked DATETIME,
+        attachment TEXT,
+        attachment_link TEXT,
+        reference_account TEXT,
+        audio BOOLEAN,
+        photo BOOLEAN,
+        video BOOLEAN
+    )
+    """,
+    """
+    CREATE TABLE conversations (
+        id BIGINT,
+        username VARCHAR NOT NULL PRIMARY KEY,
+        name VARCHAR,
+        created_at DATETIME
+    )
+    """,
+)
+
+# (message, story_reply, attachment) as the first parser wrote them
+BASELINE_MESSAGES = [
+    ("text", False, False),
+    ("Replied to their story", True, False),
+    ("You sent an attachment.", False, True),
+    ("Sent a photo", True, True),
+]
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """A SQLite ingest DB in the first schema, with the first parser's rows."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(
+            text("INSERT INTO conversations (username, name) VALUES ('alice', 'a')")
+        )
+        connection.execute(
+            text(
+                """
+                INSERT INTO messages (
+                    conversation_username, sender, message, timestamp,
+                    timestamp_iso, story_reply, liked, attachment, audio, photo, video
+                ) VALUES (
+                    'alice', 'self', :message, 'Jan 05, 2025 3:04 pm',
+                    :timestamp_iso, :story_reply, 0, :attachment, 0, 0, 0
+                )
+                """
+            ),
+            [
+                {
+                    "message": message,
+                    "timestamp_iso": datetime(2025, 1, 5, 15, 4),
+                    "story_reply": story_reply,
+                    "attachment": attachment,
+                }
+                for message, story_reply, attachment in BASELINE_MESSAGES
+            ],
+        )
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def postgres_url(tmp_path_factory):
+    url = os.environ.get("TEST_POSTGRES_URL")
+    if url:
+        return url
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")))
+    return server.get_uri().replace("postgresql://", "postgresql+psycopg2://", 1)
+
+
+@pytest.fixture
+def postgres(postgres_url):
+    """An empty, migrated Postgres database."""
+    engine = create_engine(postgres_url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA public CASCADE"))
+        connection.execute(text("CREATE SCHEMA public"))
+    migrate(engine)
+    yield engine
+    engine.dispose()
+
+
+def insert_messages(engine, conversation_id, username, messages):
+    """
+    Adds a conversation with (timestamp, sender) messages, in that id order,
+    and rebuilds the hourly rollup.
+    """
+    with engine.begin() as connection:
+        connection.execute(
+            Conversation.__table__.insert().values(
+                id=conversation_id, username=username, name=username
+            )
+        )
+        connection.execute(
+            Message.__table__.insert(),
+            [
+                {
+                    "conversation_id": conversation_id,
+                    "conversation_username": username,
+                    "sender": sender,
+                    "message": "hi",
+                    "timestamp_iso_dt": timestamp,
+                }
+                for timestamp, sender in messages
+            ],
+        )
+        connection.execute(text("DELETE FROM message_counts_hourly"))
+        connection.execute(REFRESH_HOURLY_COUNTS_SQL)
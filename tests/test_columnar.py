@@ -0,0 +1,101 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+import backend.columnar
+from backend.columnar import ColumnStore
+from backend.routes.v1 import (
+    query_monthly_volume,
+    query_response_times,
+    query_sender_counts,
+    query_summary_metrics,
+    query_volume_by_period,
+)
+from conftest import insert_messages
+
+RANGES = [
+    ("2025-03-01", "2025-12-31"),
+    ("2025-03-09 01:30", "2025-03-10"),
+    ("2025-04-01 10:15", "2025-06-30 23:59"),
+    ("2025-11-02", "2025-11-03"),
+    ("2024-01-01", "2024-02-01"),
+]
+
+
+def conversation_messages(seed):
+    """Messages with same-timestamp ties, DST changes and missing values."""
+    rng = random.Random(seed)
+    timestamp = datetime(2025, 3, 1)
+    messages = []
+    for _ in range(1500):
+        timestamp += timedelta(
+            seconds=rng.choice([0, 0, 30, 60, 600, 3600, 86400, 90000])
+        )
+        sender = rng.choice(["self", "unknown", "self", "unknown", "bob", None])
+        messages.append((None if rng.random() < 0.02 else timestamp, sender))
+    return messages
+
+
+@pytest.fixture
+def db(postgres):
+    insert_messages(postgres, 1, "alice", conversation_messages(1))
+    insert_messages(postgres, 2, "carol", conversation_messages(2))
+    with Session(postgres) as session:
+        yield session
+
+
+def both_ways(monkeypatch, query, *args):
+    """Returns what `query` gives from SQL and from the column store."""
+    monkeypatch.setattr(backend.columnar, "store", None)
+    from_sql = query(*args)
+    monkeypatch.setattr(backend.columnar, "store", ColumnStore(1 << 26))
+    from_columns = query(*args)
+    assert backend.columnar.store.stats()["conversations"] == 1
+    return from_sql, from_columns
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+@pytest.mark.parametrize("max_seconds", [86400, 600])
+def test_response_times_match_sql(db, monkeypatch, start, end, max_seconds):
+    from_sql, from_columns = both_ways(
+        monkeypatch, query_response_times, db, 1, start, end, (90, 99), max_seconds
+    )
+    assert from_columns == from_sql
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+@pytest.mark.parametrize(
+    "timezone", ["America/Los_Angeles", "Asia/Kolkata", "Europe/London"]
+)
+@pytest.mark.parametrize("boundaries", [(0, 6, 12, 18), (3, 9, 21)])
+def test_volume_by_period_matches_sql(
+    db, monkeypatch, start, end, timezone, boundaries
+):
+    from_sql, from_columns = both_ways(
+        monkeypatch, query_volume_by_period, db, 1, start, end, timezone, boundaries
+    )
+    assert from_columns == from_sql
+
+
+@pytest.mark.parametrize("start, end", RANGES + [(None, None)])
+def test_message_comparison_matches_sql(db, monkeypatch, start, end):
+    from_sql, from_columns = both_ways(
+        monkeypatch, query_sender_counts, db, "alice", start, end
+    )
+    assert from_columns == from_sql
+
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_summary_matches_sql(db, monkeypatch, start, end):
+    metrics = ["message_comparison", "message_volume"]
+    from_sql, from_columns = both_ways(
+        monkeypatch, query_summary_metrics, db, 1, start, end, metrics
+    )
+    assert from_columns == from_sql
+
+
+def test_monthly_volume_matches_sql(db, monkeypatch):
+    from_sql, from_columns = both_ways(monkeypatch, query_monthly_volume, db, "alice")
+    assert from_columns == from_sql
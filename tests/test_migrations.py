@@ -0,0 +1,66 @@
+from sqlalchemy import select, text
+
+from backend.migrations import migrate
+from backend.models import Message, SchemaVersion
+from conftest import BASELINE_MESSAGES
+
+
+def flags(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(Message.message, Message.story_reply, Message.attachment).order_by(
+                Message.id
+            )
+        ).all()
+
+
+def test_baseline_text_flags_read_back_as_booleans(baseline_db):
+    migrate(baseline_db)
+
+    assert flags(baseline_db) == BASELINE_MESSAGES
+    with baseline_db.connect() as connection:
+        stored = connection.execute(
+            text(
+                "SELECT DISTINCT typeof(story_reply), typeof(attachment) FROM messages"
+            )
+        ).all()
+    assert stored == [("integer", "integer")]
+
+
+def test_new_rows_keep_booleans_after_migrating(baseline_db):
+    migrate(baseline_db)
+    with baseline_db.begin() as connection:
+        connection.execute(
+            Message.__table__.insert().values(
+                message="new", story_reply=False, attachment=True
+            )
+        )
+
+    assert flags(baseline_db)[-1] == ("new", False, True)
+
+
+def test_postgres_text_flags_are_converted(postgres):
+    with postgres.begin() as connection:
+        connection.execute(
+            text(
+                "ALTER TABLE messages ALTER COLUMN story_reply TYPE text, "
+                "ALTER COLUMN attachment TYPE text"
+            )
+        )
+        connection.execute(
+            text(
+                "INSERT INTO messages (message, story_reply, attachment) "
+                "VALUES ('a', '0', '1'), ('b', 'true', 'false'), ('c', NULL, '0')"
+            )
+        )
+        connection.execute(
+            SchemaVersion.__table__.delete().where(SchemaVersion.version == 12)
+        )
+
+    migrate(postgres)
+
+    assert flags(postgres) == [
+        ("a", False, True),
+        ("b", True, False),
+        ("c", None, False),
+    ]
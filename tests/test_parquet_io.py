@@ -0,0 +1,34 @@
+from sqlalchemy import create_engine, select
+
+from backend.migrations import migrate
+from backend.models import Conversation, Message
+from conftest import BASELINE_MESSAGES
+from db.parquet_io import export_parquet, import_parquet
+
+
+def table_rows(engine, table):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(table).order_by(*table.primary_key.columns)
+        ).all()
+
+
+def test_legacy_db_round_trips_through_parquet(baseline_db, tmp_path):
+    migrate(baseline_db)
+    export_parquet(baseline_db, tmp_path / "parquet")
+
+    imported = create_engine(f"sqlite:///{tmp_path / 'imported.db'}")
+    migrate(imported)
+    usernames, message_count = import_parquet(imported, tmp_path / "parquet")
+
+    assert usernames == {"alice"}
+    assert message_count == len(BASELINE_MESSAGES)
+    for table in (Conversation.__table__, Message.__table__):
+        assert table_rows(imported, table) == table_rows(baseline_db, table)
+    with imported.connect() as connection:
+        flags = connection.execute(
+            select(Message.message, Message.story_reply, Message.attachment).order_by(
+                Message.id
+            )
+        ).all()
+    assert flags == BASELINE_MESSAGES
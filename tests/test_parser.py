@@ -0,0 +1,154 @@
+import pytest
+
+from benchmarks.synthetic_export import FILE_TEMPLATE, MESSAGE_TEMPLATE
+from parsing.parser import iter_html_file, parse_html_file
+
+SELF = "Aryan Thakur"
+OTHER = "Synthetic User"
+STORY_REPLY_LINK = "https://www.instagram.com/stories/aryanthakxr/3611"
+SHARED_STORY_LINK = "https://www.instagram.com/stories/synthetic.user/3612/"
+REEL_LINK = "https://www.instagram.com/reel/C9x1/"
+
+
+def reaction(timestamp):
+    return (
+        '<div><ul class="_a6-q"><li><span>❤<span>'
+        f"({timestamp})</span></span></li></ul></div>"
+    )
+
+
+# (sender, body, extra, reaction, timestamp) in the order of the export; the
+# last two are skipped by the parser
+MESSAGES = [
+    (
+        SELF,
+        "see you tonight",
+        "",
+        reaction("Apr 26, 2025 10:20 pm"),
+        "Apr 26, 2025 10:15 pm",
+    ),
+    (
+        OTHER,
+        "haha nice",
+        f'<a href="{STORY_REPLY_LINK}">story</a>',
+        "",
+        "Apr 26, 2025 9:02 pm",
+    ),
+    (
+        OTHER,
+        f"{OTHER} sent an attachment.",
+        f'<a href="{REEL_LINK}">reel</a>',
+        "",
+        "Apr 26, 2025 9:01 pm",
+    ),
+    (
+        SELF,
+        "look",
+        f'<a href="{SHARED_STORY_LINK}">story</a>',
+        "",
+        "Apr 26, 2025 12:00 pm",
+    ),
+    (
+        OTHER,
+        "",
+        '<img src="photos/1.jpg" />',
+        reaction("yesterday"),
+        "Apr 25, 2025 8:30 am",
+    ),
+    (SELF, "", '<audio src="audio/1.mp4"></audio>', "", "Apr 25, 2025 8:29 am"),
+    (OTHER, "Liked a message", "", "", "Apr 25, 2025 8:28 am"),
+    (OTHER, "नमस्ते", "", "", "Apr 25, 2025 8:27 am"),
+]
+
+RECORD = {
+    "sender": None,
+    "message": None,
+    "timestamp": None,
+    "timestamp_iso": None,
+    "story_reply": False,
+    "liked": False,
+    "timestamp_liked": None,
+    "attachment": False,
+    "attachment_link": None,
+    "reference_account": None,
+    "audio": False,
+    "video": False,
+    "photo": False,
+}
+EXPECTED = [
+    {
+        **RECORD,
+        "sender": "self",
+        "message": "see you tonight",
+        "timestamp": "Apr 26, 2025 10:15 pm",
+        "timestamp_iso": "2025-04-26 22:15:00",
+        "liked": True,
+        "timestamp_liked": "2025-04-26 22:20:00",
+    },
+    {
+        **RECORD,
+        "sender": "unknown",
+        # The story link also makes it read as a shared story of that account
+        "message": "Sent a story",
+        "timestamp": "Apr 26, 2025 9:02 pm",
+        "timestamp_iso": "2025-04-26 21:02:00",
+        "story_reply": True,
+        "reference_account": "aryanthakxr",
+    },
+    {
+        **RECORD,
+        "sender": "unknown",
+        "message": f"{OTHER} sent an attachment.",
+        "timestamp": "Apr 26, 2025 9:01 pm",
+        "timestamp_iso": "2025-04-26 21:01:00",
+        "attachment": True,
+        "attachment_link": REEL_LINK,
+    },
+    {
+        **RECORD,
+        "sender": "self",
+        "message": "Sent a story",
+        "timestamp": "Apr 26, 2025 12:00 pm",
+        "timestamp_iso": "2025-04-26 12:00:00",
+        "reference_account": "synthetic.user",
+    },
+    {
+        **RECORD,
+        "sender": "unknown",
+        "message": "Sent a photo",
+        "timestamp": "Apr 25, 2025 8:30 am",
+        "timestamp_iso": "2025-04-25 08:30:00",
+        # A reaction time that is not a timestamp is dropped
+        "liked": True,
+        "photo": True,
+    },
+    {
+        **RECORD,
+        "sender": "self",
+        "message": "Sent a voice recording",
+        "timestamp": "Apr 25, 2025 8:29 am",
+        "timestamp_iso": "2025-04-25 08:29:00",
+        "audio": True,
+    },
+]
+
+
+@pytest.fixture
+def export_file(tmp_path):
+    path = tmp_path / "message_1.html"
+    messages = "".join(
+        MESSAGE_TEMPLATE.format(
+            sender=sender, body=body, extra=extra, reaction=liked, timestamp=timestamp
+        )
+        for sender, body, extra, liked, timestamp in MESSAGES
+    )
+    path.write_text(FILE_TEMPLATE.format(title=OTHER, messages=messages), "utf-8")
+    return str(path)
+
+
+def test_parse_html_file(export_file):
+    assert parse_html_file(export_file) == EXPECTED
+
+
+def test_iter_html_file_matches_parse_html_file(export_file):
+    assert list(iter_html_file(export_file)) == EXPECTED
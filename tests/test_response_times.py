@@ -0,0 +1,100 @@
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+import backend.columnar
+from backend.routes.v1 import DEFAULT_MAX_RESPONSE_SECONDS, query_response_times
+from conftest import insert_messages
+
+START, END = "2025-01-01", "2025-12-31"
+
+
+def python_response_times(messages, max_seconds=DEFAULT_MAX_RESPONSE_SECONDS):
+    """
+    The reply-time loop the route ran in Python before the query moved into
+    the database, over messages ordered by (timestamp, id).
+    """
+    ordered = sorted(
+        (timestamp, index, sender)
+        for index, (timestamp, sender) in enumerate(messages)
+        if timestamp is not None
+    )
+    prev_sender = None
+    prev_time = None
+    durations = {"self": [], "unknown": []}
+    for timestamp, _, sender in ordered:
+        if sender is None:
+            continue
+        if prev_sender and prev_sender != sender:
+            durations[sender].append((timestamp - prev_time).total_seconds())
+        prev_sender = sender
+        prev_time = timestamp
+
+    response_times = {}
+    for sender, values in durations.items():
+        values = [value for value in values if value <= max_seconds]
+        response_times[f"avg_{sender}"] = (
+            round(statistics.mean(values), 2) if values else None
+        )
+        response_times[f"median_{sender}"] = (
+            round(statistics.median(values), 2) if values else None
+        )
+    return response_times
+
+
+@pytest.fixture
+def sql_only(monkeypatch):
+    monkeypatch.setattr(backend.columnar, "store", None)
+
+
+def response_times(engine, messages, max_seconds=DEFAULT_MAX_RESPONSE_SECONDS):
+    insert_messages(engine, 1, "alice", messages)
+    with Session(engine) as db:
+        return query_response_times(db, 1, START, END, max_seconds=max_seconds)
+
+
+def test_ties_and_cutoff(postgres, sql_only):
+    start = datetime(2025, 4, 26, 22, 15)
+    messages = [
+        (start, "self"),
+        # Same minute: ordered after the message above by id, a 0 s reply
+        (start, "unknown"),
+        (start + timedelta(seconds=60), "self"),
+        # Exactly the cutoff is kept, one second more is an outlier
+        (start + timedelta(seconds=60 + 86400), "unknown"),
+        (start + timedelta(seconds=60 + 86400 + 86401), "self"),
+        (start + timedelta(seconds=60 + 86400 + 86401 + 30), "self"),
+        # Neither breaks the pair around them
+        (start + timedelta(seconds=60 + 86400 + 86401 + 90), None),
+        (None, "self"),
+        (start + timedelta(seconds=60 + 86400 + 86401 + 160), "unknown"),
+    ]
+    expected = {
+        "avg_self": 60.0,
+        "median_self": 60.0,
+        "avg_unknown": 28843.33,
+        "median_unknown": 130.0,
+    }
+    assert python_response_times(messages) == expected
+    assert response_times(postgres, messages) == expected
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("max_seconds", [DEFAULT_MAX_RESPONSE_SECONDS, 600])
+def test_matches_python(postgres, sql_only, seed, max_seconds):
+    rng = random.Random(seed)
+    timestamp = datetime(2025, 3, 1)
+    messages = []
+    for _ in range(500):
+        timestamp += timedelta(
+            seconds=rng.choice([0, 0, 0, 60, 600, 3600, 86400, 86460])
+        )
+        sender = rng.choice(["self", "unknown", None])
+        messages.append((None if rng.random() < 0.02 else timestamp, sender))
+
+    assert response_times(postgres, messages, max_seconds) == python_response_times(
+        messages, max_seconds
+    )
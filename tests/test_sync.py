@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from backend.migrations import migrate
+from backend.models import Conversation, DataGeneration, IngestedFile, Message
+import db.sync
+from db.sync import sync
+
+
+@pytest.fixture
+def target(postgres):
+    return postgres
+
+
+@pytest.fixture
+def source(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}")
+    migrate(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            Conversation.__table__.insert().values(id=1, username="alice", name="a")
+        )
+    yield engine
+    engine.dispose()
+
+
+_ingest_times = iter(datetime(2025, 1, 1) + timedelta(minutes=n) for n in range(1000))
+
+
+def ingest(engine, path, texts, source_file=True):
+    """Replaces a file's messages the way main.py does and records it."""
+    messages = Message.__table__
+    with engine.begin() as connection:
+        connection.execute(messages.delete().where(messages.c.source_file == path))
+        connection.execute(
+            messages.insert(),
+            [
+                {
+                    "conversation_id": 1,
+                    "conversation_username": "alice",
+                    "sender": "self",
+                    "message": message,
+                    "timestamp_iso_dt": datetime(2025, 1, 1, 12),
+                    "source_file": path if source_file else None,
+                }
+                for message in texts
+            ],
+        )
+        if source_file:
+            connection.execute(
+                IngestedFile.__table__.delete().where(IngestedFile.path == path)
+            )
+            connection.execute(
+                IngestedFile.__table__.insert().values(
+                    path=path,
+                    size=len(texts),
+                    mtime=0.0,
+                    content_hash=str(hash(tuple(texts))),
+                    ingested_at=next(_ingest_times),
+                )
+            )
+        connection.execute(
+            DataGeneration.__table__.update().values(
+                generation=DataGeneration.generation + 1
+            )
+        )
+
+
+def rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(Message.id, Message.source_file, Message.message).order_by(
+                Message.id
+            )
+        ).all()
+
+
+def test_reingest_of_last_file_resends_every_row(source, target):
+    ingest(source, "a/message_1.html", [f"a{n}" for n in range(10)])
+    ingest(source, "b/message_1.html", [f"b{n}" for n in range(10)])
+    assert sync(source, target) == (20, 0)
+
+    # SQLite hands B's ids 11-20 out again, plus 21-22
+    ingest(source, "b/message_1.html", [f"new b{n}" for n in range(12)])
+    assert [row.id for row in rows(source)][-12:] == list(range(11, 23))
+
+    assert sync(source, target) == (12, 10)
+    assert rows(target) == rows(source)
+
+
+def test_same_size_reingest_resends_changed_content(source, target):
+    ingest(source, "a/message_1.html", [f"a{n}" for n in range(10)])
+    ingest(source, "b/message_1.html", [f"b{n}" for n in range(10)])
+    sync(source, target)
+
+    ingest(source, "b/message_1.html", [f"edited b{n}" for n in range(10)])
+
+    assert sync(source, target) == (10, 10)
+    assert rows(target) == rows(source)
+
+
+def test_up_to_date_target_is_left_alone(source, target):
+    ingest(source, "a/message_1.html", ["hi", "there"])
+    sync(source, target)
+
+    assert sync(source, target) is None
+
+
+def test_rows_from_before_the_manifest_are_replaced(source, target):
+    ingest(source, "a/message_1.html", ["old a0", "old a1"], source_file=False)
+    sync(source, target)
+    assert len(rows(target)) == 2
+
+    # The first ingest after upgrading replaces the rows without a source file
+    with source.begin() as connection:
+        connection.execute(Message.__table__.delete())
+    ingest(source, "a/message_1.html", ["a0", "a1", "a2"])
+
+    sync(source, target)
+    assert rows(target) == rows(source)
+
+
+def test_batches_of_a_sync_commit_together(source, target):
+    ingest(source, "a/message_1.html", [f"a{n}" for n in range(10)])
+    ingest(source, "b/message_1.html", [f"b{n}" for n in range(10)])
+
+    assert sync(source, target, batch_size=3) == (20, 0)
+    assert rows(target) == rows(source)
+
+
+def test_failed_sync_leaves_the_target_unchanged(source, target, monkeypatch):
+    ingest(source, "a/message_1.html", [f"a{n}" for n in range(10)])
+    ingest(source, "b/message_1.html", [f"b{n}" for n in range(10)])
+    sync(source, target)
+    before = rows(target)
+    ingest(source, "b/message_1.html", [f"new b{n}" for n in range(12)])
+
+    copy_upsert = db.sync._copy_upsert
+    batches = []
+
+    def fail_on_second_batch(connection, table, *args):
+        if table.name == "messages":
+            batches.append(table)
+            if len(batches) == 2:
+                raise RuntimeError("connection lost")
+        copy_upsert(connection, table, *args)
+
+    monkeypatch.setattr(db.sync, "_copy_upsert", fail_on_second_batch)
+    with pytest.raises(RuntimeError):
+        sync(source, target, batch_size=5)
+    assert rows(target) == before
+
+    monkeypatch.undo()
+    assert sync(source, target) == (12, 10)
+    assert rows(target) == rows(source)